@@ -1,9 +1,139 @@
 from manimlib import *
 import numpy as np
-from klampt.math import so3
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import quaternions
+from quality import scene_quality
 
 manim_config.camera.background_color = "#FFFFFF"  # Set the background color to black
+
+
+def gimbal_orientations(roll, pitch, yaw):
+    """
+    Absolute orientations of the roll, pitch and yaw rings for arrays of angles.
+    Roll turns about the world X axis, pitch about the Y axis carried by the
+    roll ring and yaw about the Z axis carried by the pitch ring, so the rings
+    are at Rx, Rx Ry and Rx Ry Rz. Returns three (n, 3, 3) arrays.
+    """
+    angles = np.stack(np.broadcast_arrays(roll, pitch, yaw), axis=-1)
+    return tuple(
+        quaternions.to_matrix(quaternions.from_euler(angles[..., :k], "xyz"[:k]))
+        for k in (1, 2, 3)
+    )
+
+
+def euler_timeline(moves, fps, start=(0.0, 0.0, 0.0)):
+    """
+    Sample roll, pitch and yaw at every frame of consecutive linear moves,
+    each a ((roll, pitch, yaw) increment, run time) pair. Returns the (n, 3)
+    angles and the (first, last) frame of each move, consecutive moves share
+    their end frame.
+    """
+    angles = [np.asarray(start, dtype=float)[None]]
+    spans = []
+    frame = 0
+    for delta, run_time in moves:
+        count = max(1, int(round(run_time * fps)))
+        alpha = np.arange(1, count + 1)[:, None] / count
+        angles.append(angles[-1][-1] + alpha * np.asarray(delta, dtype=float))
+        spans.append((frame, frame + count))
+        frame += count
+    return np.concatenate(angles), spans
+
+
+class RestPose():
+    """
+    The points of a mobject and its family cached in a rest pose, so a rigid
+    transform can be set as the rest points times one matrix instead of
+    composing rotations onto the current points every frame.
+    """
+    def __init__(self, mobject, center=ORIGIN):
+        self.mobject = mobject
+        self.center = np.array(center, dtype=float)
+        # All point-like data of a mesh (points and the du/dv points used for
+        # its normals) is stacked so one matmul moves the whole mesh
+        self.meshes = []
+        for mob in mobject.get_family():
+            if not mob.has_points():
+                continue
+            keys = mob.pointlike_data_keys
+            rest = np.concatenate([mob.data[key] for key in keys]) - self.center
+            self.meshes.append((mob, keys, rest))
+
+    def set_matrix(self, matrix, shift=ORIGIN):
+        """Place the mobject at its rest pose rotated by matrix about the center, then shifted."""
+        offset = self.center + shift
+        for mob, keys, rest in self.meshes:
+            _set_points(mob, keys, rest @ np.asarray(matrix).T + offset)
+        self.mobject.refresh_bounding_box(recurse_down=True)
+        return self.mobject
+
+
+class GimbalInstances():
+    """
+    Many copies of the same parts (the gimbal rings and arrow), each with its
+    own center and orientation. The parts are tessellated once and every
+    instance is a copy, the rest points of each mesh are cached once, and a
+    frame places a mesh in all instances with one batched matmul.
+    """
+    def __init__(self, parts, centers, pivot=ORIGIN, scale=1.0):
+        self.centers = np.asarray(centers, dtype=float)
+        self.scale = scale
+        self.templates = [RestPose(part, pivot).meshes for part in parts]
+        self.group = Group(*[Group(*[part.copy() for part in parts]) for _ in self.centers])
+        # meshes[p][j] holds mesh j of part p in every instance
+        self.meshes = []
+        for p in range(len(parts)):
+            families = [
+                [mob for mob in instance[p].get_family() if mob.has_points()]
+                for instance in self.group
+            ]
+            self.meshes.append(list(zip(*families)))
+
+    def set_orientations(self, orientations):
+        """Rotate part p of instance i by orientations[p][i], a (parts, instances, 3, 3) array."""
+        for template, meshes, rotations in zip(self.templates, self.meshes, orientations):
+            matrices = self.scale * np.asarray(rotations)
+            for (_, keys, rest), mobs in zip(template, meshes):
+                points = np.einsum("nij,mj->nmi", matrices, rest) + self.centers[:, None]
+                for mob, instance_points in zip(mobs, points):
+                    _set_points(mob, keys, instance_points)
+        self.group.refresh_bounding_box(recurse_down=True)
+        return self.group
+
+
+def _set_points(mob, keys, points):
+    """Write stacked point-like data back under its keys."""
+    for key, part in zip(keys, np.split(points, len(keys))):
+        mob.data[key] = part
+    mob.note_changed_data()
+
+
+def axis_alignment(source, target):
+    """Rotation turning coordinate axis source onto coordinate axis target, each 0, 1 or 2."""
+    if source == target:
+        return np.identity(3)
+    axis = np.cross(np.identity(3)[source], np.identity(3)[target])
+    return quaternions.to_matrix(quaternions.from_axis_angle(axis, PI / 2))
+
+
 class Gimbal3D(ThreeDScene):
+    # Roll, pitch and yaw increments played one after another, with run times
+    MOVES = [
+        ((0, -PI / 2, 0), 2),
+        ((2 * PI, 0, 2 * PI), 4),
+    ]
+    # Compute the ring orientations of the whole timeline in one pass and set
+    # each frame from the arrays instead of from the angle trackers
+    PRECOMPUTED = False
+
+    @property
+    def quality(self):
+        """Level of detail for the 3D mobjects, coarser in preview renders."""
+        return scene_quality(self)
+
     def construct(self):
         # Set camera view
         self.camera.frame.reorient(phi_degrees = 70, theta_degrees = 50)   
@@ -13,76 +143,90 @@ class Gimbal3D(ThreeDScene):
 
         # Create the rings and arrow
         outer_ring, middle_ring, inner_ring, arrow = self._create_rings()
-        roll = ValueTracker(0)
-        roll_axis = np.array([1.0, 0.0, 0.0])
+        if self.PRECOMPUTED:
+            self._play_precomputed((outer_ring, middle_ring, inner_ring, arrow))
+            return
 
+        roll = ValueTracker(0)
         pitch = ValueTracker(0)
-        pitch_axis = np.array([0.0, 1.0, 0.0])
-
         yaw = ValueTracker(0)
-        yaw_axis = np.array([0.0, 0.0, 1.0])
-
-        prev_ring_angles = np.array([0.0, 0.0, 0.0])
 
         texts = self._display_commands(roll.get_value(), pitch.get_value(), yaw.get_value())
         texts[0].add_updater(lambda m: m.set_value(roll.get_value()))
         texts[1].add_updater(lambda m: m.set_value(pitch.get_value()))
         texts[2].add_updater(lambda m: m.set_value(yaw.get_value()))
 
+        # Every frame sets each ring to its rest pose times its absolute
+        # orientation, so no error builds up over the animation
+        rings = (outer_ring, middle_ring, inner_ring, arrow)
+        center = outer_ring.get_center()
+        poses = [RestPose(ring, center) for ring in rings]
+
         # Update for all rings
         def update_rings(m):
-            diff_angles = np.array([roll.get_value(), pitch.get_value(), yaw.get_value()]) - prev_ring_angles
-            # diff_angles = np.vectorize(radians)(diff_angles)
-
-            # Roll
-            outer_ring.rotate(diff_angles[0], axis=roll_axis)
-            middle_ring.rotate(diff_angles[[0]], axis=roll_axis)
-            inner_ring.rotate(diff_angles[0], axis=roll_axis)
-            arrow.rotate(diff_angles[0], axis=roll_axis)
-            pitch_axis[:] = np.array(so3.apply(so3.from_axis_angle((list(roll_axis), diff_angles[0])), list(pitch_axis)))
-            yaw_axis[:] = np.array(so3.apply(so3.from_axis_angle((list(roll_axis), diff_angles[0])), list(yaw_axis)))
-
-            # Pitch
-            middle_ring.rotate(diff_angles[1], axis=pitch_axis)
-            inner_ring.rotate(diff_angles[1], axis=pitch_axis)
-            arrow.rotate(diff_angles[1], axis=pitch_axis)
-            yaw_axis[:] = np.array(so3.apply(so3.from_axis_angle((list(pitch_axis), diff_angles[1])), list(yaw_axis)))
-            
-            # Yaw
-            inner_ring.rotate(diff_angles[2], axis=yaw_axis)
-            arrow.rotate(diff_angles[2], axis=yaw_axis)
-
-            prev_ring_angles[:] = np.array([roll.get_value(), pitch.get_value(), yaw.get_value()])
-            # Hacky fix to keep the arrow in the center. Arrow seems to be drifting for some reason
-            arrow.move_to(inner_ring.get_center())
-            
+            outer, middle, inner = gimbal_orientations(roll.get_value(), pitch.get_value(), yaw.get_value())
+            # The arrow is carried by the yaw ring
+            for pose, rotation in zip(poses, (outer, middle, inner, inner)):
+                pose.set_matrix(rotation)
+
         arrow.add_updater(update_rings)
 
         # Show gimbal lock
-        self.play(ApplyMethod(pitch.increment_value, -math.pi/2), run_time=2, rate_func=linear)
-        self.play(ApplyMethod(roll.increment_value, 2 * math.pi), ApplyMethod(yaw.increment_value, 2 * math.pi), run_time=4, rate_func=linear)
-        
+        for (d_roll, d_pitch, d_yaw), run_time in self.MOVES:
+            moves = [
+                ApplyMethod(tracker.increment_value, delta)
+                for tracker, delta in ((roll, d_roll), (pitch, d_pitch), (yaw, d_yaw))
+                if delta != 0
+            ]
+            self.play(*moves, run_time=run_time, rate_func=linear)
+
+    def _play_precomputed(self, rings):
+        """
+        Play MOVES with every frame's ring orientations computed up front and
+        set on the rest poses of the rings.
+        """
+        angles, spans = euler_timeline(self.MOVES, self.camera.fps)
+        outer, middle, inner = gimbal_orientations(*angles.T)
+        # The arrow is carried by the yaw ring
+        orientations = (outer, middle, inner, inner)
+        center = rings[0].get_center()
+        poses = [RestPose(ring, center) for ring in rings]
+
+        texts = self._display_commands(*angles[0])
+
+        def set_frame(frame):
+            for pose, rotation in zip(poses, orientations):
+                pose.set_matrix(rotation[frame])
+            for text, angle in zip(texts, angles[frame]):
+                text.set_value(angle)
+
+        for ((first, last), (_, run_time)) in zip(spans, self.MOVES):
+            def update(m, alpha, first=first, last=last):
+                set_frame(first + int(round(alpha * (last - first))))
+            self.play(UpdateFromAlphaFunc(rings[-1], update), run_time=run_time, rate_func=linear)
+
     def _create_rings(self):
         # Parameters
         ring_thickness = 0.13  # Tube (minor) radius
+        quality = self.quality
 
         # Outer Torus (Roll ring)
-        outer_ring_sphere = Sphere(radius=0.2, color=RED)
-        outer_ring_ob = Torus(r1=3, r2=ring_thickness, color=RED)
+        outer_ring_sphere = Sphere(radius=0.2, color=RED, **quality.surface(Sphere))
+        outer_ring_ob = Torus(r1=3, r2=ring_thickness, color=RED, **quality.surface(Torus))
         outer_ring_sphere.move_to(outer_ring_ob.get_center() + np.array([-3, 0, 0]))
         outer_ring = Group(outer_ring_ob, outer_ring_sphere)
         outer_ring.rotate(PI / 2, axis=UP)
 
         # Middle Torus (Pitch ring)
-        middle_ring_sphere = Sphere(radius=0.2, color=GREEN)
-        middle_ring_ob = Torus(r1=2.5, r2=ring_thickness, color=GREEN)
+        middle_ring_sphere = Sphere(radius=0.2, color=GREEN, **quality.surface(Sphere))
+        middle_ring_ob = Torus(r1=2.5, r2=ring_thickness, color=GREEN, **quality.surface(Torus))
         middle_ring_sphere.move_to(middle_ring_ob.get_center() + np.array([0, 2.5, 0]))
         middle_ring = Group(middle_ring_ob, middle_ring_sphere)
         middle_ring.rotate(PI / 2, axis=RIGHT)
 
         # Inner Torus (Yaw ring)
-        inner_ring_sphere = Sphere(radius=0.2, color=BLUE)
-        inner_ring_ob = Torus(r1=2.1, r2=ring_thickness, color=BLUE)
+        inner_ring_sphere = Sphere(radius=0.2, color=BLUE, **quality.surface(Sphere))
+        inner_ring_ob = Torus(r1=2.1, r2=ring_thickness, color=BLUE, **quality.surface(Torus))
         inner_ring_sphere.move_to(inner_ring_ob.get_center() + np.array([2.1, 0, 0]))
         inner_ring = Group(inner_ring_ob, inner_ring_sphere)
 
@@ -99,9 +243,10 @@ class Gimbal3D(ThreeDScene):
     
     def _display_coordinate_frame(self, origin=ORIGIN, axis_length=1.0, axis_thickness=0.05):
         """Create a 3D coordinate frame with X, Y, and Z axes."""
-        x_axis = Line3D(start=origin, end=origin + np.array([axis_length, 0, 0]), width=axis_thickness, color=RED)
-        y_axis = Line3D(start=origin, end=origin + np.array([0, axis_length, 0]), width=axis_thickness, color=GREEN)
-        z_axis = Line3D(start=origin, end=origin + np.array([0, 0, axis_length]), width=axis_thickness, color=BLUE)
+        quality = self.quality
+        x_axis = Line3D(start=origin, end=origin + np.array([axis_length, 0, 0]), width=axis_thickness, color=RED, **quality.surface(Line3D))
+        y_axis = Line3D(start=origin, end=origin + np.array([0, axis_length, 0]), width=axis_thickness, color=GREEN, **quality.surface(Line3D))
+        z_axis = Line3D(start=origin, end=origin + np.array([0, 0, axis_length]), width=axis_thickness, color=BLUE, **quality.surface(Line3D))
         
         # Labels
         x_label = Text("X", color=RED).scale(0.5).next_to(x_axis.get_end(), RIGHT, buff=0.1)
@@ -153,9 +298,168 @@ class Gimbal3D(ThreeDScene):
     
     def _create_center_arrow(self):
         line = Prism(width=3.0, height=0.2, depth=0.2, color=GREY)
-        cone = Cone(radius=0.3, height=0.5, color=GREY)
+        cone = Cone(radius=0.3, height=0.5, color=GREY, **self.quality.surface(Cone))
         cone.move_to([1.5, 0.0, 0.0])
         cone.rotate(PI / 2, axis=UP)
         arrow = Group(line, cone)
         self.add(arrow)
-        return arrow
\ No newline at end of file
+        return arrow
+
+class Gimbal3DPrecomputed(Gimbal3D):
+    PRECOMPUTED = True
+
+
+class EulerVsQuaternion(Gimbal3D):
+    # Roll, pitch and yaw of the orientations to interpolate between
+    START = (0, 0, 0)
+    END = (PI, -PI / 3, PI)
+    RUN_TIME = 4
+    OFFSET = 3.5
+
+    def construct(self):
+        """
+        Turn two arrows between the same orientations, one by interpolating the
+        Euler angles and one by SLERP of the quaternions. Every frame of both
+        paths is computed up front.
+        """
+        self.camera.frame.reorient(phi_degrees = 70, theta_degrees = 50)
+
+        count = max(1, int(round(self.RUN_TIME * self.camera.fps)))
+        t = np.linspace(0, 1, count + 1)
+        start, end = np.array(self.START, dtype=float), np.array(self.END, dtype=float)
+        paths = [
+            quaternions.from_euler(start + t[:, None] * (end - start)),
+            quaternions.slerp(quaternions.from_euler(start), quaternions.from_euler(end), t),
+        ]
+        rotations = [quaternions.to_matrix(path) for path in paths]
+
+        arrows, traces, labels = [], [], []
+        for path, rotation, side, color, name in zip(
+            paths, rotations, (LEFT, RIGHT), (RED, BLUE), ("Euler angles", "Quaternion SLERP")
+        ):
+            shift = side * self.OFFSET
+            arrow = self._create_center_arrow()
+            pose = RestPose(arrow, ORIGIN)
+            pose.set_matrix(rotation[0], shift)
+            arrows.append((pose, rotation, shift))
+
+            # Path of the arrow tip, one corner per frame
+            tips = rotation @ np.array([1.75, 0.0, 0.0]) + shift
+            trace = VMobject(stroke_color=color, stroke_width=self.quality.stroke(4)).set_points_as_corners(tips)
+            traces.append(trace)
+
+            # Total angle turned through, summed from the log map of each step
+            turned = quaternions.angle_between(path[:-1], path[1:]).sum()
+            label = VGroup(
+                Text(name, font_size=30, fill_color=color),
+                Text(f"Turned through {np.degrees(turned):.0f}°", font_size=24, fill_color=BLACK),
+            ).arrange(DOWN, buff=0.2)
+            label.to_edge(UP).shift(side * self.OFFSET)
+            label.fix_in_frame()
+            labels.append(label)
+
+        self.play(*[Write(label) for label in labels])
+
+        def set_frame(m, alpha):
+            frame = int(round(alpha * count))
+            for pose, rotation, shift in arrows:
+                pose.set_matrix(rotation[frame], shift)
+
+        self.play(
+            UpdateFromAlphaFunc(arrows[0][0].mobject, set_frame),
+            *[ShowCreation(trace) for trace in traces],
+            run_time=self.RUN_TIME,
+            rate_func=linear,
+        )
+        self.wait(2)
+
+
+class EulerConventions(Gimbal3D):
+    # Intrinsic rotation orders, one gimbal each: the six Tait-Bryan orders
+    # and the six proper Euler orders
+    ORDERS = ["xyz", "xzy", "yxz", "yzx", "zxy", "zyx", "xyx", "xzx", "yxy", "yzy", "zxz", "zyz"]
+    GRID = (4, 3)
+    SCALE = 0.36
+    # Turn about Z then tilt about X, applied to the gimbals instead of
+    # reorienting the camera so the labels stay flat on the screen
+    VIEW = (-40 * DEGREES, -70 * DEGREES)
+
+    def construct(self):
+        """
+        Run the same moves on a grid of gimbals that share their meshes. Every
+        instance's ring orientations for the whole timeline come from one
+        batched orientation array.
+        """
+        parts = self._create_rings()
+        pivot = parts[0].get_center()
+        self.remove(*parts)
+
+        columns, rows = self.GRID
+        x = (np.arange(columns) - (columns - 1) / 2) * FRAME_WIDTH / columns
+        y = ((rows - 1) / 2 - np.arange(rows)) * (FRAME_HEIGHT - 0.5) / rows
+        centers = np.array([[cx, cy, 0.0] for cy in y for cx in x])[:len(self.ORDERS)]
+        instances = GimbalInstances(parts, centers, pivot, self.SCALE)
+
+        orientations, spans = self._orientations()
+        self.add(instances.group)
+        instances.set_orientations(orientations[:, 0])
+        labels = VGroup(*[
+            Text(label, font_size=24, fill_color=BLACK).move_to(center + DOWN * 1.3)
+            for label, center in zip(self._labels(), centers)
+        ])
+        self.play(Write(labels))
+
+        for ((first, last), (_, run_time)) in zip(spans, self.MOVES):
+            def update(m, alpha, first=first, last=last):
+                instances.set_orientations(orientations[:, first + int(round(alpha * (last - first)))])
+            self.play(UpdateFromAlphaFunc(instances.group, update), run_time=run_time, rate_func=linear)
+        self.wait()
+
+    def _start_angles(self):
+        # Tait-Bryan orders lock at a middle angle of -90 degrees and proper
+        # Euler orders at -180 degrees, so both reach it with the same moves
+        return [(0, -PI / 2 if order[0] == order[2] else 0, 0) for order in self.ORDERS]
+
+    def _labels(self):
+        return [order.upper() for order in self.ORDERS]
+
+    def _orientations(self):
+        """
+        Orientations of the outer, middle and inner rings and the arrow of
+        every instance at every frame, shape (4, frames, instances, 3, 3).
+        """
+        turn, tilt = self.VIEW
+        view = quaternions.to_matrix(quaternions.from_euler((tilt, 0, turn), "xyz"))
+        angles = np.stack([
+            euler_timeline(self.MOVES, self.camera.fps, start)[0]
+            for start in self._start_angles()
+        ], axis=1)
+        spans = euler_timeline(self.MOVES, self.camera.fps)[1]
+
+        orientations = np.empty((4,) + angles.shape[:2] + (3, 3))
+        for i, order in enumerate(self.ORDERS):
+            # The rings are built turning about X, Y and Z, align each with
+            # the axis it turns about in this order
+            alignments = [axis_alignment(k, quaternions.AXES[axis]) for k, axis in enumerate(order)]
+            alignments.append(alignments[2])
+            for p in range(4):
+                k = min(p, 2) + 1
+                turns = quaternions.to_matrix(quaternions.from_euler(angles[:, i, :k], order[:k]))
+                orientations[p, :, i] = view @ turns @ alignments[p]
+        return orientations, spans
+
+
+class GimbalPitchGrid(EulerConventions):
+    # XYZ gimbals starting at pitches closer and closer to -90 degrees, then
+    # rolling and yawing together
+    ORDERS = ["xyz"] * 12
+    PITCHES = -PI / 2 + np.radians([60, 45, 30, 20, 15, 10, 7, 5, 3, 2, 1, 0])
+    MOVES = [
+        ((2 * PI, 0, 2 * PI), 4),
+    ]
+
+    def _start_angles(self):
+        return [(0, pitch, 0) for pitch in self.PITCHES]
+
+    def _labels(self):
+        return [f"Pitch {np.degrees(pitch):.0f}°" for pitch in self.PITCHES]
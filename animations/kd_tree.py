@@ -1,5 +1,11 @@
 from manimlib import *
 import numpy as np
+import argparse
+import csv
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 
 manim_config.camera.background_color = WHITE
 
@@ -14,11 +20,23 @@ class KDTreeNode:
         self.children = []
         self.graph_node = None
         self.edge = None
-        self.areas = []
+        self.bounds = None
 
     def __repr__(self):
         return f"KDTreeNode({self.point})"
 
+    def set_bounds(self, lower, upper):
+        # The cell of a node is its parent's cell cut at the parent's split value
+        self.bounds = (tuple(lower), tuple(upper))
+        if self.leaf:
+            return
+        left_upper = list(upper)
+        left_upper[self.dim] = self.val
+        right_lower = list(lower)
+        right_lower[self.dim] = self.val
+        self.children[0].set_bounds(lower, left_upper)
+        self.children[1].set_bounds(right_lower, upper)
+
 class Point():
     def __init__(self, x, y, axes):
         self.axes = axes
@@ -29,6 +47,859 @@ class Point():
         self.world_x = self.dot.get_center()[0]
         self.world_y = self.dot.get_center()[1]
 
+class _TidyNode():
+    """Layout bookkeeping for one tree node (Buchheim, Juenger and Leipert)."""
+    def __init__(self, node, parent=None, depth=0, number=0):
+        self.node = node
+        self.parent = parent
+        self.depth = depth
+        self.number = number
+        self.children = []
+        self.collapsed = False
+        self.x = 0.0
+        self.mod = 0.0
+        self.change = 0.0
+        self.shift = 0.0
+        self.thread = None
+        self.ancestor = self
+
+    def left(self):
+        return self.thread or (self.children[0] if self.children else None)
+
+    def right(self):
+        return self.thread or (self.children[-1] if self.children else None)
+
+    def left_brother(self):
+        if self.parent is None or self.number == 0:
+            return None
+        return self.parent.children[self.number - 1]
+
+    def leftmost_sibling(self):
+        if self.parent is None or self.number == 0:
+            return None
+        return self.parent.children[0]
+
+
+def tidy_tree_layout(root, children, max_depth=None, distance=1.0):
+    """
+    Lay out a tree in linear time so that no two nodes on the same level are
+    closer than `distance` and every parent sits centered above its children.
+    `children(node)` returns the child nodes to lay out. Nodes at `max_depth`
+    are collapsed: their subtree is not laid out and they are marked so the
+    caller can draw a summary instead.
+    Returns the laid out _TidyNode objects, parents before children.
+    """
+    tidy_root = _TidyNode(root)
+    order = [tidy_root]
+    stack = [tidy_root]
+    while stack:
+        t = stack.pop()
+        kids = children(t.node)
+        if max_depth is not None and t.depth >= max_depth:
+            t.collapsed = len(kids) > 0
+            continue
+        t.children = [_TidyNode(c, t, t.depth + 1, i) for i, c in enumerate(kids)]
+        order.extend(t.children)
+        stack.extend(reversed(t.children))
+
+    _first_walk(tidy_root, distance)
+
+    # Second walk, accumulate the modifiers from the root down
+    mods = {id(tidy_root): 0.0}
+    for t in order:
+        m = mods.pop(id(t))
+        t.x += m
+        for w in t.children:
+            mods[id(w)] = m + t.mod
+    return order
+
+
+def _first_walk(t, distance):
+    if not t.children:
+        brother = t.left_brother()
+        t.x = brother.x + distance if brother else 0.0
+        return
+    default_ancestor = t.children[0]
+    for w in t.children:
+        _first_walk(w, distance)
+        default_ancestor = _apportion(w, default_ancestor, distance)
+    _execute_shifts(t)
+    midpoint = (t.children[0].x + t.children[-1].x) / 2
+    brother = t.left_brother()
+    if brother:
+        t.x = brother.x + distance
+        t.mod = t.x - midpoint
+    else:
+        t.x = midpoint
+
+
+def _apportion(v, default_ancestor, distance):
+    w = v.left_brother()
+    if w is None:
+        return default_ancestor
+    vir = vor = v
+    vil = w
+    vol = v.leftmost_sibling()
+    sir = sor = v.mod
+    sil = vil.mod
+    sol = vol.mod
+    while vil.right() and vir.left():
+        vil = vil.right()
+        vir = vir.left()
+        vol = vol.left()
+        vor = vor.right()
+        vor.ancestor = v
+        shift = (vil.x + sil) - (vir.x + sir) + distance
+        if shift > 0:
+            ancestor = vil.ancestor if vil.ancestor.parent is v.parent else default_ancestor
+            subtrees = v.number - ancestor.number
+            v.change -= shift / subtrees
+            v.shift += shift
+            ancestor.change += shift / subtrees
+            v.x += shift
+            v.mod += shift
+            sir += shift
+            sor += shift
+        sil += vil.mod
+        sir += vir.mod
+        sol += vol.mod
+        sor += vor.mod
+    if vil.right() and not vor.right():
+        vor.thread = vil.right()
+        vor.mod += sil - sor
+    else:
+        if vir.left() and not vol.left():
+            vol.thread = vir.left()
+            vol.mod += sir - sol
+        default_ancestor = v
+    return default_ancestor
+
+
+def _execute_shifts(v):
+    shift = change = 0.0
+    for w in reversed(v.children):
+        w.x += shift
+        w.mod += shift
+        change += w.change
+        shift += w.shift + change
+
+
+class FlatKDTree():
+    """
+    KD-tree over an (n, k) array of points, stored as flat node arrays so it
+    scales to millions of points. The points are reordered so that every node
+    owns the contiguous range points[start:end]; `index` maps that order back
+    to the rows of the input. Leaves hold at most `leaf_size` points and
+    nodes are numbered in preorder. `split` picks where internal nodes split:
+      "median"           median of the next axis in turn, like the KDTree scene
+      "max_spread"       median of the axis with the largest spread
+      "sliding_midpoint" middle of the longest side of the node's cell, slid
+                         onto the closest point if one side would be empty
+      "sah"              the candidate along the largest spread with the lowest
+                         surface area heuristic cost (points times half
+                         perimeter of each side)
+
+    With workers > 1 the top `parallel_depth` levels are split here and the
+    disjoint subtrees below them are built by a process pool over shared
+    memory. The result is identical for any number of workers.
+    """
+    def __init__(self, points, leaf_size=16, workers=1, parallel_depth=None, split="median"):
+        if split not in SPLIT_RULES:
+            raise ValueError(f"Unknown split rule {split!r}, expected one of {SPLIT_RULES}")
+        self.points = np.array(points, dtype=np.float64)
+        self.index = np.arange(len(self.points), dtype=np.int64)
+        self.leaf_size = leaf_size
+        self.split = split
+        if workers > 1:
+            if parallel_depth is None:
+                # A few subtrees per worker to even out the load
+                parallel_depth = int(np.ceil(np.log2(workers))) + 2
+            nodes = self._build_parallel(workers, parallel_depth)
+        else:
+            nodes = _build_nodes(self.points, self.index, 0, len(self.points), 0, leaf_size, split,
+                                 *_bounding_box(self.points))
+        self._set_nodes(nodes)
+
+    def _build_parallel(self, workers, parallel_depth):
+        shm_points = shared_memory.SharedMemory(create=True, size=max(self.points.nbytes, 1))
+        shm_index = shared_memory.SharedMemory(create=True, size=max(self.index.nbytes, 1))
+        try:
+            points = np.ndarray(self.points.shape, dtype=self.points.dtype, buffer=shm_points.buf)
+            index = np.ndarray(self.index.shape, dtype=self.index.dtype, buffer=shm_index.buf)
+            points[:] = self.points
+            index[:] = self.index
+
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                def split_top(start, end, depth, lower, upper):
+                    if end - start <= self.leaf_size:
+                        return ("subtree", _build_nodes(
+                            points, index, start, end, depth, self.leaf_size, self.split, lower, upper,
+                        ))
+                    if depth >= parallel_depth:
+                        return ("subtree", pool.submit(
+                            _build_shared_subtree, shm_points.name, shm_index.name,
+                            points.shape, start, end, depth, self.leaf_size, self.split, lower, upper,
+                        ))
+                    dim, val, mid = _split(points, index, start, end, depth, self.split, lower, upper)
+                    (left_lower, left_upper), (right_lower, right_upper) = _cut_cell(lower, upper, dim, val)
+                    return ("node", dim, val, start, end,
+                            split_top(start, mid, depth + 1, left_lower, left_upper),
+                            split_top(mid, end, depth + 1, right_lower, right_upper))
+
+                top = split_top(0, len(points), 0, *_bounding_box(points))
+                nodes = _assemble_preorder(top)
+
+            self.points = points.copy()
+            self.index = index.copy()
+            del points, index
+        finally:
+            shm_points.close()
+            shm_points.unlink()
+            shm_index.close()
+            shm_index.unlink()
+        return nodes
+
+    # File layout: magic, version, header length, JSON header, then the
+    # arrays, each aligned to 64 bytes so np.memmap can map them directly.
+    FILE_MAGIC = b"KDTREE\x00\x00"
+    FILE_VERSION = 2
+    FILE_ARRAYS = ("points", "index", "split_dim", "split_val", "left", "right", "start", "end", "lower", "upper")
+    _ALIGN = 64
+
+    def save(self, path):
+        """Write the tree as a single file of flat arrays."""
+        arrays = {}
+        offset = 0
+        for name in self.FILE_ARRAYS:
+            array = np.ascontiguousarray(getattr(self, name))
+            arrays[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset += -(-array.nbytes // self._ALIGN) * self._ALIGN
+        header = json.dumps({"leaf_size": self.leaf_size, "split": self.split, "arrays": arrays}).encode()
+        data_start = -(-(len(self.FILE_MAGIC) + 8 + len(header)) // self._ALIGN) * self._ALIGN
+        with open(path, "wb") as f:
+            f.write(self.FILE_MAGIC)
+            f.write(np.array([self.FILE_VERSION, len(header)], dtype="<u4").tobytes())
+            f.write(header)
+            for name in self.FILE_ARRAYS:
+                f.seek(data_start + arrays[name]["offset"])
+                np.ascontiguousarray(getattr(self, name)).tofile(f)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """
+        Map a tree written by save() without copying or deserializing it. Pages
+        are read on demand and shared between processes mapping the same file.
+        """
+        with open(path, "rb") as f:
+            magic = f.read(len(cls.FILE_MAGIC))
+            if magic != cls.FILE_MAGIC:
+                raise ValueError(f"{path} is not a KD-tree file")
+            version, header_len = np.frombuffer(f.read(8), dtype="<u4")
+            # Version 1 files have no node bounds, they are recomputed on load
+            if version not in (1, cls.FILE_VERSION):
+                raise ValueError(f"{path} has KD-tree file version {version}, expected {cls.FILE_VERSION}")
+            header = json.loads(f.read(header_len))
+        data_start = -(-(len(cls.FILE_MAGIC) + 8 + int(header_len)) // cls._ALIGN) * cls._ALIGN
+
+        tree = cls.__new__(cls)
+        tree.leaf_size = header["leaf_size"]
+        tree.split = header.get("split", "median")
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            shape = tuple(spec["shape"])
+            if np.prod(shape) == 0:
+                arrays[name] = np.empty(shape, dtype=spec["dtype"])
+            else:
+                arrays[name] = np.memmap(path, dtype=spec["dtype"], mode=mmap_mode,
+                                         offset=data_start + spec["offset"], shape=shape)
+        tree.points = arrays.pop("points")
+        tree.index = arrays.pop("index")
+        tree._set_nodes(arrays)
+        return tree
+
+    def _set_nodes(self, nodes):
+        self.split_dim = nodes["split_dim"]
+        self.split_val = nodes["split_val"]
+        self.left = nodes["left"]
+        self.right = nodes["right"]
+        self.start = nodes["start"]
+        self.end = nodes["end"]
+        if "lower" in nodes:
+            self.lower = nodes["lower"]
+            self.upper = nodes["upper"]
+        else:
+            self.lower, self.upper = _node_bounds(self.points, self.start, self.end)
+        self._lists = None
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def num_nodes(self):
+        return len(self.split_dim)
+
+    def _node_lists(self):
+        # Python lists are much faster than numpy scalars in the search loop,
+        # but a tree mapped by load() is searched in place: converting would
+        # read every page up front and give each process its own copy
+        if isinstance(self.split_dim, np.memmap):
+            return self.split_dim, self.split_val, self.left, self.right, self.start, self.end
+        if self._lists is None:
+            self._lists = (
+                self.split_dim.tolist(),
+                self.split_val.tolist(),
+                self.left.tolist(),
+                self.right.tolist(),
+                self.start.tolist(),
+                self.end.tolist(),
+            )
+        return self._lists
+
+    def query(self, x):
+        """Return (distance, index) of the nearest point to x."""
+        best_d, best_i, _ = self._query(np.asarray(x, dtype=np.float64), np.inf, -1)
+        return np.sqrt(best_d), self.index[best_i]
+
+    def query_batch(self, xs):
+        """Nearest neighbors of every row of xs, returns (distances, indices)."""
+        xs = np.asarray(xs, dtype=np.float64)
+        best_d, best_i = self._leaf_guess(xs)
+        for q in range(len(xs)):
+            best_d[q], best_i[q], _ = self._query(xs[q], best_d[q], best_i[q])
+        return np.sqrt(best_d), self.index[best_i]
+
+    def range_count(self, lower, upper):
+        """Number of points p with lower <= p <= upper in every dimension."""
+        return sum(len(r) for r in self._range(lower, upper, count_only=True))
+
+    def range_report(self, lower, upper):
+        """Indices of the points p with lower <= p <= upper in every dimension."""
+        ranges = self._range(lower, upper)
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(ranges)
+
+    def stats(self, queries=None):
+        """
+        Shape of the tree: depth, leaf occupancy histogram (number of leaves
+        holding 0, 1, ... leaf_size points), aspect ratio (longest over
+        shortest side) of the leaf cells and, if queries are given, the
+        average number of nodes visited per nearest neighbor query.
+        """
+        split_dim, split_val, left, right, start, end = self._node_lists()
+        k = self.points.shape[1]
+        depth = np.zeros(self.num_nodes, dtype=np.int64)
+        # Cells are cut out of the bounding box of all points, parents first
+        cell_lower = np.empty((self.num_nodes, k))
+        cell_upper = np.empty((self.num_nodes, k))
+        cell_lower[0] = self.lower[0]
+        cell_upper[0] = self.upper[0]
+        for node in range(self.num_nodes):
+            dim = split_dim[node]
+            if dim < 0:
+                continue
+            for child in (left[node], right[node]):
+                depth[child] = depth[node] + 1
+                cell_lower[child] = cell_lower[node]
+                cell_upper[child] = cell_upper[node]
+            cell_upper[left[node], dim] = split_val[node]
+            cell_lower[right[node], dim] = split_val[node]
+
+        leaves = self.split_dim < 0
+        sides = cell_upper[leaves] - cell_lower[leaves]
+        longest = sides.max(axis=1)
+        shortest = sides.min(axis=1)
+        aspect = np.where(shortest > 0, longest / np.maximum(shortest, 1e-300), np.inf)
+        finite = aspect[np.isfinite(aspect)]
+        occupancy = (self.end - self.start)[leaves]
+        report = {
+            "split": self.split,
+            "num_nodes": self.num_nodes,
+            "num_leaves": int(leaves.sum()),
+            "max_depth": int(depth.max()),
+            "mean_leaf_depth": float(depth[leaves].mean()),
+            "leaf_occupancy": np.bincount(occupancy, minlength=self.leaf_size + 1).tolist(),
+            "aspect_mean": float(finite.mean()) if len(finite) else None,
+            "aspect_median": float(np.median(finite)) if len(finite) else None,
+            "aspect_p95": float(np.percentile(finite, 95)) if len(finite) else None,
+            "degenerate_cells": int(len(aspect) - len(finite)),
+        }
+        if queries is not None:
+            visited = [self._query(np.asarray(x, dtype=np.float64), np.inf, -1)[2] for x in queries]
+            report["nodes_visited"] = float(np.mean(visited))
+        return report
+
+    def _range(self, lower, upper, count_only=False):
+        # Nodes whose bounding box is inside the query are taken whole (only
+        # their size when counting), nodes that miss it are skipped and only
+        # the partial overlaps are descended.
+        lower = np.asarray(lower, dtype=np.float64)
+        upper = np.asarray(upper, dtype=np.float64)
+        found = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if np.any(self.upper[node] < lower) or np.any(self.lower[node] > upper):
+                continue
+            s, e = self.start[node], self.end[node]
+            if np.all(self.lower[node] >= lower) and np.all(self.upper[node] <= upper):
+                found.append(range(s, e) if count_only else self.index[s:e])
+            elif self.split_dim[node] < 0:
+                pts = self.points[s:e]
+                inside = np.all((pts >= lower) & (pts <= upper), axis=1)
+                found.append(np.flatnonzero(inside) if count_only else self.index[s:e][inside])
+            else:
+                stack.append(self.right[node])
+                stack.append(self.left[node])
+        return found
+
+    def _query(self, x, best_d, best_i):
+        # Depth first search with the squared distance to the splitting planes
+        # as the lower bound. Returns (squared distance, position, nodes visited).
+        split_dim, split_val, left, right, start, end = self._node_lists()
+        points = self.points
+        visited = 0
+        stack = [(0, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if bound >= best_d:
+                continue
+            visited += 1
+            dim = split_dim[node]
+            if dim < 0:
+                s, e = start[node], end[node]
+                d = points[s:e] - x
+                d = np.einsum("ij,ij->i", d, d)
+                j = int(np.argmin(d))
+                if d[j] < best_d:
+                    best_d = float(d[j])
+                    best_i = s + j
+                continue
+            diff = x[dim] - split_val[node]
+            if diff < 0:
+                near, far = left[node], right[node]
+            else:
+                near, far = right[node], left[node]
+            stack.append((far, max(bound, diff * diff)))
+            stack.append((near, bound))
+        return best_d, best_i, visited
+
+    def _leaf_guess(self, xs):
+        # Descend all queries at once, then search each query's own leaf to get
+        # a tight starting bound for the per-query search.
+        node = np.zeros(len(xs), dtype=np.int64)
+        rows = np.arange(len(xs))
+        while True:
+            dims = self.split_dim[node]
+            inner = dims >= 0
+            if not inner.any():
+                break
+            go_left = xs[rows[inner], dims[inner]] < self.split_val[node[inner]]
+            node[inner] = np.where(go_left, self.left[node[inner]], self.right[node[inner]])
+        best_d = np.full(len(xs), np.inf)
+        best_i = np.zeros(len(xs), dtype=np.int64)
+        order = np.argsort(node, kind="stable")
+        leaves, first = np.unique(node[order], return_index=True)
+        for leaf, group in zip(leaves, np.split(order, first[1:])):
+            s, e = self.start[leaf], self.end[leaf]
+            d = ((xs[group, None, :] - self.points[None, s:e, :]) ** 2).sum(-1)
+            j = np.argmin(d, axis=1)
+            best_d[group] = d[np.arange(len(group)), j]
+            best_i[group] = s + j
+        return best_d, best_i
+
+
+def _build_nodes(points, index, start, end, depth, leaf_size, split="median", lower=None, upper=None):
+    # Build the subtree over points[start:end] in place, nodes in preorder.
+    # lower and upper bound the subtree's cell, its points' bounding box by
+    # default, and are cut at every split for the children
+    if lower is None:
+        lower, upper = _bounding_box(points[start:end])
+    split_dim, split_val, left, right, starts, ends = [], [], [], [], [], []
+    stack = [(start, end, depth, -1, 0, lower, upper)]
+    while stack:
+        s, e, d, parent, side, cell_lower, cell_upper = stack.pop()
+        node = len(starts)
+        starts.append(s)
+        ends.append(e)
+        left.append(-1)
+        right.append(-1)
+        if parent >= 0:
+            (left if side == 0 else right)[parent] = node
+        if e - s <= leaf_size:
+            split_dim.append(-1)
+            split_val.append(0.0)
+            continue
+        dim, val, mid = _split(points, index, s, e, d, split, cell_lower, cell_upper)
+        split_dim.append(dim)
+        split_val.append(val)
+        (left_lower, left_upper), (right_lower, right_upper) = _cut_cell(cell_lower, cell_upper, dim, val)
+        stack.append((mid, e, d + 1, node, 1, right_lower, right_upper))
+        stack.append((s, mid, d + 1, node, 0, left_lower, left_upper))
+    return {
+        "split_dim": np.array(split_dim, dtype=np.int32),
+        "split_val": np.array(split_val, dtype=np.float64),
+        "left": np.array(left, dtype=np.int64),
+        "right": np.array(right, dtype=np.int64),
+        "start": np.array(starts, dtype=np.int64),
+        "end": np.array(ends, dtype=np.int64),
+    }
+
+
+def _build_shared_subtree(points_name, index_name, shape, start, end, depth, leaf_size, split, lower, upper):
+    # Runs in a worker process. Only points[start:end] is touched, so workers
+    # never write to the same memory.
+    shm_points = shared_memory.SharedMemory(name=points_name)
+    shm_index = shared_memory.SharedMemory(name=index_name)
+    try:
+        points = np.ndarray(shape, dtype=np.float64, buffer=shm_points.buf)
+        index = np.ndarray(shape[:1], dtype=np.int64, buffer=shm_index.buf)
+        nodes = _build_nodes(points, index, start, end, depth, leaf_size, split, lower, upper)
+        del points, index
+    finally:
+        shm_points.close()
+        shm_index.close()
+    return nodes
+
+
+def _assemble_preorder(top):
+    # Lay the top nodes and the subtrees out in the same preorder as a serial build
+    chunks = []
+    count = 0
+
+    def emit(part):
+        nonlocal count
+        if part[0] == "subtree":
+            nodes = part[1] if isinstance(part[1], dict) else part[1].result()
+            nodes = dict(nodes)
+            for key in ("left", "right"):
+                nodes[key] = np.where(nodes[key] >= 0, nodes[key] + count, -1)
+            chunks.append(nodes)
+            count += len(nodes["start"])
+            return
+        _, dim, val, start, end, left_part, right_part = part
+        node = {
+            "split_dim": np.array([dim], dtype=np.int32),
+            "split_val": np.array([val], dtype=np.float64),
+            "left": np.array([count + 1], dtype=np.int64),
+            "right": np.array([-1], dtype=np.int64),
+            "start": np.array([start], dtype=np.int64),
+            "end": np.array([end], dtype=np.int64),
+        }
+        chunks.append(node)
+        count += 1
+        emit(left_part)
+        node["right"][0] = count
+        emit(right_part)
+
+    emit(top)
+    return {key: np.concatenate([c[key] for c in chunks]) for key in chunks[0]}
+
+
+def _bounding_box(points):
+    if len(points) == 0:
+        return np.zeros(points.shape[1]), np.zeros(points.shape[1])
+    return points.min(axis=0), points.max(axis=0)
+
+
+def _cut_cell(lower, upper, dim, val):
+    # Cells of the two children of a node splitting its cell at val along dim
+    left_upper = upper.copy()
+    left_upper[dim] = val
+    right_lower = lower.copy()
+    right_lower[dim] = val
+    return (lower, left_upper), (right_lower, upper)
+
+
+def _node_bounds(points, start, end):
+    # Tight bounding box of every node's range of points. reduceat reduces
+    # over [idx[i], idx[i + 1]), so the ranges are interleaved and every
+    # other result is kept.
+    if len(points) == 0:
+        empty = np.zeros((len(start), points.shape[1]))
+        return empty, empty.copy()
+    padded = np.vstack([points, points[-1:]])
+    idx = np.empty(2 * len(start), dtype=np.int64)
+    idx[0::2] = start
+    idx[1::2] = end
+    lower = np.minimum.reduceat(padded, idx, axis=0)[0::2]
+    upper = np.maximum.reduceat(padded, idx, axis=0)[0::2]
+    return lower, upper
+
+
+SPLIT_RULES = ("median", "max_spread", "sliding_midpoint", "sah")
+
+
+def _split(points, index, start, end, depth, rule="median", lower=None, upper=None):
+    # Reorder points[start:end] in place so that the left half is
+    # points[start:mid] with coordinates <= val along dim and the right half
+    # has coordinates >= val. lower and upper bound the node's cell, which
+    # only the sliding midpoint rule looks at. Returns (dim, val, mid).
+    block = points[start:end]
+    if rule == "median":
+        return _median_split(points, index, start, end, depth % points.shape[1])
+    spread = block.max(axis=0) - block.min(axis=0)
+    dim = int(np.argmax(spread))
+    if rule == "max_spread" or spread[dim] == 0:
+        return _median_split(points, index, start, end, dim)
+
+    if rule == "sliding_midpoint":
+        if lower is None:
+            lower, upper = _bounding_box(block)
+        # Longest side of the cell, among the axes the points can be split on
+        sides = np.where(spread > 0, upper - lower, -1.0)
+        dim = int(np.argmax(sides))
+        coords = block[:, dim]
+        val = (lower[dim] + upper[dim]) / 2
+        left = coords < val
+        if left.all():
+            # Slide onto the closest point so the right side gets it
+            val = coords.max()
+            left = coords < val
+    else:
+        coords = block[:, dim]
+        val, left = _sah_split(block, dim)
+    if not left.any():
+        # Slide onto the closest point so neither side is empty
+        val = coords.min()
+        left = coords <= val
+    order = np.argsort(~left, kind="stable")
+    points[start:end] = block[order]
+    index[start:end] = index[start:end][order]
+    return dim, float(val), start + int(left.sum())
+
+
+def _median_split(points, index, start, end, dim):
+    # The median point goes to the right half, as in the scene
+    mid = (end - start) // 2
+    order = np.argpartition(points[start:end, dim], mid)
+    points[start:end] = points[start:end][order]
+    index[start:end] = index[start:end][order]
+    return dim, float(points[start + mid, dim]), start + mid
+
+
+def _sah_split(block, dim, candidates=8):
+    # Cost of a split is the number of points on each side times the half
+    # perimeter of that side's bounding box, the cheapest candidate wins
+    coords = block[:, dim]
+    best = (np.inf, None, None)
+    for val in np.unique(np.quantile(coords, np.arange(1, candidates) / candidates)):
+        left = coords < val
+        n_left = int(left.sum())
+        if n_left == 0 or n_left == len(coords):
+            continue
+        cost = 0.0
+        for side in (block[left], block[~left]):
+            cost += len(side) * np.sum(side.max(axis=0) - side.min(axis=0))
+        if cost < best[0]:
+            best = (cost, val, left)
+    if best[1] is None:
+        val = (coords.min() + coords.max()) / 2
+        return val, coords < val
+    return best[1], best[2]
+
+
+
+class _DynamicNode():
+    __slots__ = ("point", "dim", "left", "right", "size", "deleted", "name", "graph_node")
+
+    def __init__(self, point, dim, name=None):
+        self.point = point
+        self.dim = dim
+        self.left = None
+        self.right = None
+        self.size = 1
+        self.deleted = False
+        self.name = name
+        self.graph_node = None
+
+    # Same interface as KDTreeNode for drawing. Every node holds a point.
+    leaf = False
+
+    @property
+    def children(self):
+        return [c for c in (self.left, self.right) if c is not None]
+
+
+class DynamicKDTree():
+    """
+    KD-tree with one point per node that supports inserts and deletes.
+    Deleted points are only flagged. A subtree is rebuilt into a balanced
+    tree when an insert lands deeper than log(size) / log(1 / alpha), at the
+    lowest ancestor whose child holds more than alpha of its nodes (the
+    scapegoat), and the whole tree is rebuilt once half of it is deleted.
+    Rebuilds are median splits, so inserts are O(log^2 n) amortized.
+    """
+    def __init__(self, dim=2, alpha=0.7):
+        self.dim = dim
+        self.alpha = alpha
+        self.root = None
+        self.size = 0
+        self.live = 0
+        self._names = _node_names()
+
+    def __len__(self):
+        return self.live
+
+    def insert(self, point):
+        """Insert a point. Returns the root of the rebuilt subtree, if any."""
+        point = tuple(float(c) for c in point)
+        new = _DynamicNode(point, 0, next(self._names))
+        self.size += 1
+        self.live += 1
+        if self.root is None:
+            self.root = new
+            return None
+
+        path = []
+        node = self.root
+        while node is not None:
+            path.append(node)
+            node.size += 1
+            if point[node.dim] < node.point[node.dim]:
+                child = node.left
+                if child is None:
+                    node.left = new
+            else:
+                child = node.right
+                if child is None:
+                    node.right = new
+            node = child
+        new.dim = (path[-1].dim + 1) % self.dim
+
+        if len(path) <= np.log(self.size) / np.log(1 / self.alpha):
+            return None
+        child = new
+        for i in range(len(path) - 1, -1, -1):
+            if child.size > self.alpha * path[i].size:
+                return self._rebuild(path, i)
+            child = path[i]
+        return None
+
+    def delete(self, point):
+        """
+        Flag a point as deleted. Returns the new root if this triggered a full
+        rebuild, raises KeyError if the point is not in the tree.
+        """
+        point = tuple(float(c) for c in point)
+        node = self._find(self.root, point)
+        if node is None:
+            raise KeyError(point)
+        node.deleted = True
+        self.live -= 1
+        if self.live <= self.size / 2:
+            return self._rebuild([self.root], 0)
+        return None
+
+    def nearest(self, point):
+        """Return (distance, point) of the closest live point, or None if empty."""
+        x = np.asarray(point, dtype=np.float64)
+        best = [np.inf, None]
+        # Subtrees carry the squared distance to their splitting planes,
+        # checked when popped so the best distance found since then counts
+        stack = [(self.root, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if node is None or bound >= best[0]:
+                continue
+            if not node.deleted:
+                d = float(np.sum((np.asarray(node.point) - x) ** 2))
+                if d < best[0]:
+                    best = [d, node.point]
+            diff = x[node.dim] - node.point[node.dim]
+            near, far = (node.left, node.right) if diff < 0 else (node.right, node.left)
+            stack.append((far, max(bound, diff * diff)))
+            stack.append((near, bound))
+        if best[1] is None:
+            return None
+        return np.sqrt(best[0]), best[1]
+
+    def height(self, node=None):
+        node = self.root if node is None else node
+        if node is None:
+            return 0
+        return 1 + max([self.height(c) for c in node.children], default=0)
+
+    def _find(self, node, point):
+        while node is not None:
+            if not node.deleted and node.point == point:
+                return node
+            v = node.point[node.dim]
+            if point[node.dim] < v:
+                node = node.left
+            elif point[node.dim] > v:
+                node = node.right
+            else:
+                # Equal keys can end up on either side after a rebuild
+                found = self._find(node.left, point)
+                if found is not None:
+                    return found
+                node = node.right
+        return None
+
+    def _rebuild(self, path, i):
+        # Rebuild the subtree rooted at path[i] from its live nodes
+        old = path[i]
+        nodes = []
+        stack = [old]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            if not node.deleted:
+                nodes.append(node)
+            stack.append(node.left)
+            stack.append(node.right)
+        removed = old.size - len(nodes)
+        new = self._build_balanced(nodes, old.dim)
+        for ancestor in path[:i]:
+            ancestor.size -= removed
+        self.size -= removed
+        if i == 0:
+            self.root = new
+        elif path[i - 1].left is old:
+            path[i - 1].left = new
+        else:
+            path[i - 1].right = new
+        return new
+
+    def _build_balanced(self, nodes, dim):
+        if not nodes:
+            return None
+        coords = np.array([n.point[dim] for n in nodes])
+        mid = len(nodes) // 2
+        order = np.argpartition(coords, mid)
+        nodes = [nodes[j] for j in order]
+        root = nodes[mid]
+        root.dim = dim
+        root.size = len(nodes)
+        next_dim = (dim + 1) % self.dim
+        root.left = self._build_balanced(nodes[:mid], next_dim)
+        root.right = self._build_balanced(nodes[mid + 1:], next_dim)
+        return root
+
+
+def _node_names():
+    # A, B, ..., Z, AA, AB, ...
+    n = 0
+    while True:
+        name = ""
+        i = n
+        while True:
+            name = chr(ord("A") + i % 26) + name
+            i = i // 26 - 1
+            if i < 0:
+                break
+        yield name
+        n += 1
+
+
+def _count_points(node):
+    if node.leaf:
+        return len(node.children)
+    return sum(_count_points(c) for c in node.children)
+
+
 class KDTree(Scene):
     def construct(self):
         self.text_obj = None
@@ -113,12 +984,7 @@ class KDTree(Scene):
                     Now, if the point's value is less than the root's value in the y-direction, we go left. Otherwise, we go right. In this case, we go right.
                     """, {"y-direction": RED})
                 self._delete_info()
-            self.play(
-                node.areas[first_child_index].animate.set_fill(opacity=0.5),
-            )
-            self.play(
-                node.areas[first_child_index].animate.set_fill(opacity=0),
-            )
+            self._flash_area(node.children[first_child_index].bounds)
             nn = dfs(node.children[first_child_index], nn)
             if node.name == "C":
                 self._write_info("""
@@ -132,12 +998,7 @@ class KDTree(Scene):
                     If it is, we check the other side of the tree like for this E node. This is because the nearest neighbor could be on the other side.
                     """, {})
                     self._delete_info()
-                self.play(
-                    node.areas[second_child_index].animate.set_fill(opacity=0.5),
-                )
-                self.play(
-                    node.areas[second_child_index].animate.set_fill(opacity=0),
-                )
+                self._flash_area(node.children[second_child_index].bounds)
                 nn = dfs(node.children[second_child_index], nn)
             self.play(
                 node.graph_node.animate.set_stroke(BLACK),
@@ -182,20 +1043,28 @@ class KDTree(Scene):
         self.play(*[FadeIn(point.dot) for point in points_dots], run_time=2.0)
         return points_dots, axes
 
-    def _create_area_highlight(self, p1, p2, p3, p4):
+    def _create_area_highlight(self, bounds, color=RED):
         # Create a polygon to highlight the area
+        (x0, y0), (x1, y1) = bounds
         area = Polygon(
-            self.axes.c2p(p1[0], p1[1], 0.0),
-            self.axes.c2p(p2[0], p2[1], 0.0),
-            self.axes.c2p(p3[0], p3[1], 0.0),
-            self.axes.c2p(p4[0], p4[1], 0.0),
-            fill_color=RED,
+            self.axes.c2p(x0, y0, 0.0),
+            self.axes.c2p(x0, y1, 0.0),
+            self.axes.c2p(x1, y1, 0.0),
+            self.axes.c2p(x1, y0, 0.0),
+            fill_color=color,
             fill_opacity=0.0,
             stroke_width=0
         )
         self.add(area)
         return area
 
+    def _flash_area(self, bounds):
+        # Only the region being shown lives in the scene
+        area = self._create_area_highlight(bounds)
+        self.play(area.animate.set_fill(opacity=0.5))
+        self.play(area.animate.set_fill(opacity=0))
+        self.remove(area)
+
     def _create_kd_tree(self):
         # A
         self._write_info(
@@ -210,20 +1079,6 @@ class KDTree(Scene):
         a_graph_node = self._draw_graph_node((3, 3), "A", 0, a_p.local_x)
         a_node.graph_node = a_graph_node
         a_node.edge = a_edge
-        # Left area
-        a_node.areas.append(self._create_area_highlight(
-            (self.axes.x_range[0], self.axes.y_range[0]),
-            (self.axes.x_range[0], self.axes.y_range[1]),
-            (a_p.local_x, self.axes.y_range[1]),
-            (a_p.local_x, self.axes.y_range[0])
-        ))
-        # Right area
-        a_node.areas.append(self._create_area_highlight(
-            (a_p.local_x, self.axes.y_range[0]),
-            (a_p.local_x, self.axes.y_range[1]),
-            (self.axes.x_range[1], self.axes.y_range[1]),
-            (self.axes.x_range[1], self.axes.y_range[0])
-        ))
         self._delete_info()
 
         self._write_info(
@@ -239,20 +1094,6 @@ class KDTree(Scene):
         self._draw_arrow(a_graph_node, b_graph_node)
         b_node.graph_node = b_graph_node
         a_node.children.append(b_node)
-        # Bottom area
-        b_node.areas.append(self._create_area_highlight(
-            (self.axes.x_range[0], self.axes.y_range[0]),
-            (self.axes.x_range[0], b_p.local_y),
-            (a_p.local_x, b_p.local_y),
-            (a_p.local_x, self.axes.y_range[0])
-        ))
-        # Top area
-        b_node.areas.append(self._create_area_highlight(
-            (self.axes.x_range[0], b_p.local_y),
-            (self.axes.x_range[0], self.axes.y_range[1]),
-            (a_p.local_x, self.axes.y_range[1]),
-            (a_p.local_x, b_p.local_y)
-        ))
 
         # C
         c_p = self.points[9]
@@ -263,20 +1104,6 @@ class KDTree(Scene):
         self._draw_arrow(a_graph_node, c_graph_node)
         c_node.graph_node = c_graph_node
         a_node.children.append(c_node)
-        # Bottom area
-        c_node.areas.append(self._create_area_highlight(
-            (a_p.local_x, self.axes.y_range[0]),
-            (a_p.local_x, c_p.local_y),
-            (self.axes.x_range[1], c_p.local_y),
-            (self.axes.x_range[1], self.axes.y_range[0])
-        ))
-        # Top area
-        c_node.areas.append(self._create_area_highlight(
-            (a_p.local_x, c_p.local_y),
-            (a_p.local_x, self.axes.y_range[1]),
-            (self.axes.x_range[1], self.axes.y_range[1]),
-            (self.axes.x_range[1], c_p.local_y)
-        ))
         self._delete_info()
 
         self._write_info(
@@ -331,20 +1158,6 @@ class KDTree(Scene):
         self._draw_arrow(c_graph_node, d_graph_node)
         d_node.graph_node = d_graph_node
         c_node.children.append(d_node)
-        # Left area
-        d_node.areas.append(self._create_area_highlight(
-            (a_p.local_x, self.axes.y_range[0]),
-            (a_p.local_x, c_p.local_y),
-            (d_p.local_x, c_p.local_y),
-            (d_p.local_x, self.axes.y_range[0])
-        ))
-        # Right area
-        d_node.areas.append(self._create_area_highlight(
-            (d_p.local_x, self.axes.y_range[0]),
-            (d_p.local_x, c_p.local_y),
-            (self.axes.x_range[0], c_p.local_y),
-            (self.axes.x_range[0], self.axes.y_range[0])
-        ))
         
         # E
         e_p = self.points[11]
@@ -355,20 +1168,6 @@ class KDTree(Scene):
         self._draw_arrow(c_graph_node, e_graph_node)
         e_node.graph_node = e_graph_node
         c_node.children.append(e_node)
-        # Left area
-        e_node.areas.append(self._create_area_highlight(
-            (a_p.local_x, c_p.local_y),
-            (a_p.local_x, self.axes.y_range[1]),
-            (e_p.local_x, self.axes.y_range[1]),
-            (e_p.local_x, c_p.local_y)
-        ))
-        # Right area
-        e_node.areas.append(self._create_area_highlight(
-            (e_p.local_x, c_p.local_y),
-            (e_p.local_x, self.axes.y_range[1]),
-            (self.axes.x_range[1], self.axes.y_range[1]),
-            (self.axes.x_range[1], c_p.local_y)
-        ))
         self._delete_info()
 
         self._write_info(
@@ -440,9 +1239,110 @@ class KDTree(Scene):
         e_node_leaf_right.graph_node = VGroup(square, point_group)
         e_node.children.append(e_node_leaf_right)
         self._delete_info()
+
+        a_node.set_bounds(
+            (self.axes.x_range[0], self.axes.y_range[0]),
+            (self.axes.x_range[1], self.axes.y_range[1]),
+        )
         return a_node
 
 
+    def _build_tree(self, points, depth=0, leaf_size=3, names=None):
+        # Median split alternating between the axes, the median point goes right
+        if names is None:
+            names = iter(_node_names())
+        if len(points) <= leaf_size:
+            node = KDTreeNode(next(names), leaf=True)
+            node.children = points
+            return node
+        dim = depth % 2
+        points = sorted(points, key=lambda p: [p.local_x, p.local_y][dim])
+        mid = len(points) // 2
+        node = KDTreeNode(next(names), dim, points[mid])
+        node.children = [
+            self._build_tree(points[:mid], depth + 1, leaf_size, names),
+            self._build_tree(points[mid:], depth + 1, leaf_size, names),
+        ]
+        return node
+
+    def _draw_partitions(self, kd_tree, run_time=2.0):
+        # All split lines as a single mobject
+        lines = VMobject(stroke_color=BLACK, stroke_width=2)
+        stack = [kd_tree]
+        while stack:
+            node = stack.pop()
+            if node.leaf:
+                continue
+            (x0, y0), (x1, y1) = node.bounds
+            if node.dim == 0:
+                start, end = (node.val, y0), (node.val, y1)
+            else:
+                start, end = (x0, node.val), (x1, node.val)
+            lines.start_new_path(self.axes.c2p(*start))
+            lines.add_line_to(self.axes.c2p(*end))
+            stack.extend(node.children)
+        self.play(ShowCreation(lines), run_time=run_time)
+        return lines
+
+    def _draw_graph(self, kd_tree, center, width, height, max_depth=None, label_limit=31, run_time=2.0,
+                    count=_count_points):
+        """
+        Draw the whole tree in the graph panel in a single play. Subtrees deeper
+        than `max_depth` are collapsed into a triangle labelled with their
+        number of points, and all edges are one batched mobject.
+        """
+        layout = tidy_tree_layout(
+            kd_tree,
+            lambda n: [] if n.leaf else n.children,
+            max_depth=max_depth,
+        )
+        min_x = min(t.x for t in layout)
+        span_x = max(max(t.x for t in layout) - min_x, 1.0)
+        depth = max(max(t.depth for t in layout), 1)
+        dx = width / span_x
+        dy = height / depth
+        size = min(0.3, 0.4 * dx, 0.3 * dy)
+        show_labels = len(layout) <= label_limit
+        left = center[0] - width / 2
+        top = center[1] + height / 2
+
+        nodes = VGroup()
+        edges = VMobject(stroke_color=BLACK, stroke_width=1)
+        positions = {}
+        for t in layout:
+            pos = np.array([left + (t.x - min_x) * dx, top - t.depth * dy, 0.0])
+            positions[id(t)] = pos
+            if t.collapsed:
+                graph_node = Triangle(stroke_color=BLACK, stroke_width=2, fill_color=WHITE, fill_opacity=1)
+                graph_node.set_width(2 * size).move_to(pos)
+                count_label = Text(str(count(t.node)), font_size=16, fill_color=BLACK)
+                count_label.next_to(graph_node, DOWN, buff=0.05)
+                nodes.add(graph_node, count_label)
+            elif t.node.leaf:
+                graph_node = Square(side_length=2 * size, stroke_color=BLACK, fill_opacity=0.0, stroke_width=2)
+                graph_node.move_to(pos)
+                nodes.add(graph_node)
+            else:
+                fill_color = GREY if getattr(t.node, "deleted", False) else WHITE
+                graph_node = Dot(point=pos, fill_color=fill_color, stroke_color=BLACK, stroke_width=2, radius=size)
+                nodes.add(graph_node)
+                if show_labels:
+                    label = Text(t.node.name, font_size=24 * size / 0.3, fill_color=BLACK)
+                    label.move_to(pos)
+                    nodes.add(label)
+            t.node.graph_node = graph_node
+            if t.parent is not None:
+                edges.start_new_path(positions[id(t.parent)] + DOWN * size)
+                edges.add_line_to(pos + UP * size)
+
+        self.play(ShowCreation(edges), FadeIn(nodes), run_time=run_time)
+        return VGroup(edges, nodes)
+
+    def _flash_nodes(self, nodes, color=RED):
+        graph_nodes = VGroup(*[n.graph_node for n in nodes if n.graph_node is not None])
+        self.play(graph_nodes.animate.set_fill(color), run_time=0.5)
+        self.play(graph_nodes.animate.set_fill(WHITE), run_time=0.5)
+
     def _draw_arrow(self, n1, n2):
         arrow = Arrow(
             start=n1.get_bottom(),
@@ -539,4 +1439,365 @@ class KDTree(Scene):
 
     def _delete_info(self):
         # Remove the text from the scene
-        self.play(FadeOut(self.text_obj))
\ No newline at end of file
+        self.play(FadeOut(self.text_obj))
+
+
+class KDTreeLarge(KDTree):
+    NUM_POINTS = 200
+    LEAF_SIZE = 3
+    # Subtrees below this depth are summarized in the graph panel
+    MAX_GRAPH_DEPTH = 5
+
+    def construct(self):
+        self.text_obj = None
+        self._title_screen("KD-Tree of Many Points")
+        rng = np.random.default_rng(0)
+        axes = Axes(
+            x_range=[0, 8, 1],
+            y_range=[0, 7, 1],
+            axis_config={"color": BLUE},
+            height=5,
+            width=5,
+        )
+        axes.set_color(BLACK)
+        axes.shift(LEFT*3.5)
+        self.axes = axes
+        self.play(ShowCreation(axes), run_time=1.0)
+
+        coords = rng.uniform([0.2, 0.2], [7.8, 6.8], size=(self.NUM_POINTS, 2))
+        self.points = [Point(round(x, 2), round(y, 2), axes) for x, y in coords]
+        self.play(FadeIn(VGroup(*[p.dot for p in self.points])), run_time=1.0)
+
+        kd_tree = self._build_tree(self.points, leaf_size=self.LEAF_SIZE)
+        kd_tree.set_bounds(
+            (axes.x_range[0], axes.y_range[0]),
+            (axes.x_range[1], axes.y_range[1]),
+        )
+        self._draw_partitions(kd_tree)
+        self._draw_graph(kd_tree, center=(3.7, 0.4), width=6.0, height=5.5, max_depth=self.MAX_GRAPH_DEPTH)
+        self.wait(2)
+
+
+class KDTreeDynamic(KDTree):
+    NUM_POINTS = 24
+    # The whole tree is rebuilt once half of it is deleted, delete past that
+    NUM_DELETES = NUM_POINTS // 2 + 1
+
+    def construct(self):
+        self.text_obj = None
+        self._title_screen("Inserting into a KD-Tree")
+        rng = np.random.default_rng(1)
+        axes = Axes(
+            x_range=[0, 8, 1],
+            y_range=[0, 7, 1],
+            axis_config={"color": BLUE},
+            height=5,
+            width=5,
+        )
+        axes.set_color(BLACK)
+        axes.shift(LEFT*3.5)
+        self.axes = axes
+        self.play(ShowCreation(axes), run_time=1.0)
+
+        tree = DynamicKDTree(dim=2)
+        dots = {}
+        graph = None
+        explained = False
+        # Samples arrive sorted in x, the worst case for an unbalanced tree
+        coords = rng.uniform([0.2, 0.2], [7.8, 6.8], size=(self.NUM_POINTS, 2))
+        coords = coords[np.argsort(coords[:, 0])]
+        for x, y in np.round(coords, 2):
+            point = Point(x, y, axes)
+            dots[(x, y)] = point.dot
+            self.play(FadeIn(point.dot), run_time=0.3)
+            rebuilt = tree.insert((x, y))
+            graph = self._redraw_dynamic_graph(tree, graph)
+            if rebuilt is not None:
+                if not explained:
+                    self._write_info("""
+                    The new point landed too deep, so we walk back up to the first node whose child holds most of its
+                    points (the scapegoat) and rebuild only that subtree (red) balanced around its medians.
+                    """, {"red": RED})
+                    self._delete_info()
+                    explained = True
+                self._flash_nodes(self._subtree(rebuilt))
+
+        self._write_info("""
+            Deleting only flags the node (grey). Once half of the tree is deleted, it is rebuilt from the points left.
+            """, {"grey": GREY})
+        full_rebuild = False
+        for x, y in list(dots)[:self.NUM_DELETES]:
+            rebuilt = tree.delete((x, y))
+            self.play(FadeOut(dots.pop((x, y))), run_time=0.3)
+            graph = self._redraw_dynamic_graph(tree, graph)
+            if rebuilt is not None:
+                full_rebuild = True
+                self._flash_nodes(self._subtree(rebuilt))
+        if not full_rebuild:
+            raise RuntimeError(f"{self.NUM_DELETES} deletes of {self.NUM_POINTS} points did not rebuild the tree")
+        self._delete_info()
+        self.wait(2)
+
+    def _redraw_dynamic_graph(self, tree, graph):
+        if graph is not None:
+            self.remove(graph)
+        return self._draw_graph(
+            tree.root, center=(3.7, 0.6), width=6.0, height=5.0, run_time=0.5,
+        )
+
+    def _subtree(self, node):
+        nodes = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(node.children)
+        return nodes
+
+
+class KDTreeRangeQuery(KDTree):
+    # Query box in axes coordinates
+    QUERY_BOX = ((3.0, 1.0), (6.6, 4.6))
+    INSIDE_COLOR = GREEN
+    OUTSIDE_COLOR = GREY
+    PARTIAL_COLOR = YELLOW
+
+    def construct(self):
+        self.text_obj = None
+        self._title_screen("Range Query using the KD-Tree")
+        self.points, self.axes = self._create_scene()
+        kd_tree = self._build_tree(self.points)
+        kd_tree.set_bounds(
+            (self.axes.x_range[0], self.axes.y_range[0]),
+            (self.axes.x_range[1], self.axes.y_range[1]),
+        )
+        self._draw_partitions(kd_tree)
+        self._draw_graph(kd_tree, center=(3.7, 0.6), width=6.0, height=4.5)
+
+        (x0, y0), (x1, y1) = self.QUERY_BOX
+        box = Polygon(
+            self.axes.c2p(x0, y0),
+            self.axes.c2p(x0, y1),
+            self.axes.c2p(x1, y1),
+            self.axes.c2p(x1, y0),
+            stroke_color="#0000FF",
+            stroke_width=4,
+        )
+        box.set_z_index(5)
+        self.play(ShowCreation(box))
+        self._write_info("""
+            To count the points in the (blue) box, we compare the box with the cell of each node from the root down.
+            Cells completely inside (green) are counted with the stored size of the node, cells outside (grey) are skipped,
+            and only the cells partially covered (yellow) are split further.
+            """, {"blue": BLUE, "green": self.INSIDE_COLOR, "grey": self.OUTSIDE_COLOR, "yellow": self.PARTIAL_COLOR})
+        count = self._range_query(kd_tree, self.QUERY_BOX)
+        self._delete_info()
+        self._write_info(f"""
+            There are {count} points in the box.
+            """, {})
+        self.wait(2)
+
+    def _range_query(self, node, box):
+        (qx0, qy0), (qx1, qy1) = box
+        (x0, y0), (x1, y1) = node.bounds
+        if x1 < qx0 or x0 > qx1 or y1 < qy0 or y0 > qy1:
+            self._shade_node(node, self.OUTSIDE_COLOR)
+            return 0
+        if qx0 <= x0 and x1 <= qx1 and qy0 <= y0 and y1 <= qy1:
+            self._shade_node(node, self.INSIDE_COLOR)
+            return _count_points(node)
+
+        area = self._create_area_highlight(node.bounds, self.PARTIAL_COLOR)
+        self.play(
+            area.animate.set_fill(opacity=0.4),
+            node.graph_node.animate.set_fill(self.PARTIAL_COLOR, opacity=1),
+            run_time=0.5,
+        )
+        self.play(area.animate.set_fill(opacity=0), run_time=0.5)
+        self.remove(area)
+        if node.leaf:
+            inside = [p for p in node.children if qx0 <= p.local_x <= qx1 and qy0 <= p.local_y <= qy1]
+            if inside:
+                self.play(*[p.dot.animate.set_fill(RED) for p in inside], run_time=0.5)
+            return len(inside)
+        return sum(self._range_query(child, box) for child in node.children)
+
+    def _shade_node(self, node, color):
+        # Whole subtrees are settled at once, their cells stay shaded
+        area = self._create_area_highlight(node.bounds, color)
+        self.play(
+            area.animate.set_fill(opacity=0.4),
+            node.graph_node.animate.set_fill(color, opacity=1),
+            run_time=0.5,
+        )
+
+
+def _benchmark_points(rng, n, dim, distribution):
+    if distribution == "uniform":
+        return rng.random((n, dim))
+    # Gaussian blobs around a few random centers
+    centers = rng.random((16, dim))
+    labels = rng.integers(0, len(centers), n)
+    return centers[labels] + rng.normal(scale=0.02, size=(n, dim))
+
+
+def _brute_force(points, xs, chunk=None):
+    # Nearest neighbors by computing every distance, in chunks of queries.
+    # A chunk's distance matrix is kept to about 1e7 entries (80 MB)
+    if chunk is None:
+        chunk = max(1, int(1e7 // max(len(points), 1)))
+    sq_points = np.einsum("ij,ij->i", points, points)
+    best_d = np.empty(len(xs))
+    best_i = np.empty(len(xs), dtype=np.int64)
+    for s in range(0, len(xs), chunk):
+        q = xs[s:s + chunk]
+        d = sq_points[None, :] - 2.0 * q @ points.T
+        j = np.argmin(d, axis=1)
+        best_i[s:s + chunk] = j
+        best_d[s:s + chunk] = d[np.arange(len(q)), j] + np.einsum("ij,ij->i", q, q)
+    return np.sqrt(np.maximum(best_d, 0.0)), best_i
+
+
+def benchmark(sizes=(10**2, 10**3, 10**4, 10**5, 10**6), dims=range(2, 9),
+              distributions=("uniform", "clustered"), num_single=100, num_batch=1000,
+              leaf_size=16, seed=0, workers=1, split="median"):
+    """
+    Time FlatKDTree against brute force NumPy nearest neighbor search.
+    Returns one row per (distribution, dim, n) with build time, per query
+    times in microseconds for single and batched queries, and the mean number
+    of nodes visited per query.
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for distribution in distributions:
+        for dim in dims:
+            for n in sizes:
+                points = _benchmark_points(rng, n, dim, distribution)
+                queries = _benchmark_points(rng, num_batch, dim, distribution)
+                single = queries[:num_single]
+
+                t = time.perf_counter()
+                tree = FlatKDTree(points, leaf_size=leaf_size, workers=workers, split=split)
+                build = time.perf_counter() - t
+
+                visited = []
+                t = time.perf_counter()
+                for x in single:
+                    visited.append(tree._query(x, np.inf, -1)[2])
+                kd_single = (time.perf_counter() - t) / len(single)
+
+                t = time.perf_counter()
+                for x in single:
+                    d = points - x
+                    np.argmin(np.einsum("ij,ij->i", d, d))
+                brute_single = (time.perf_counter() - t) / len(single)
+
+                t = time.perf_counter()
+                kd_d, _ = tree.query_batch(queries)
+                kd_batch = (time.perf_counter() - t) / len(queries)
+
+                t = time.perf_counter()
+                brute_d, _ = _brute_force(points, queries)
+                brute_batch = (time.perf_counter() - t) / len(queries)
+
+                if not np.allclose(kd_d, brute_d):
+                    raise RuntimeError(f"KD-tree and brute force disagree for n={n}, dim={dim}, {distribution}")
+
+                rows.append({
+                    "distribution": distribution,
+                    "dim": dim,
+                    "n": n,
+                    "build_s": build,
+                    "kd_single_us": kd_single * 1e6,
+                    "brute_single_us": brute_single * 1e6,
+                    "kd_batch_us": kd_batch * 1e6,
+                    "brute_batch_us": brute_batch * 1e6,
+                    "nodes_visited": float(np.mean(visited)),
+                    "num_nodes": tree.num_nodes,
+                })
+    return rows
+
+
+def crossover_points(rows):
+    """Smallest n at which the KD-tree beats brute force, per series and query mode."""
+    crossovers = []
+    series = sorted({(r["distribution"], r["dim"]) for r in rows})
+    for distribution, dim in series:
+        series_rows = sorted(
+            (r for r in rows if r["distribution"] == distribution and r["dim"] == dim),
+            key=lambda r: r["n"],
+        )
+        for mode in ("single", "batch"):
+            n = next(
+                (r["n"] for r in series_rows if r[f"kd_{mode}_us"] < r[f"brute_{mode}_us"]),
+                None,
+            )
+            crossovers.append({"distribution": distribution, "dim": dim, "mode": mode, "n": n})
+    return crossovers
+
+
+def compare_splits(points, queries, rules=SPLIT_RULES, leaf_size=16):
+    """Build time and FlatKDTree.stats for every split rule on the same data."""
+    reports = []
+    for rule in rules:
+        t = time.perf_counter()
+        tree = FlatKDTree(points, leaf_size=leaf_size, split=rule)
+        build = time.perf_counter() - t
+        report = tree.stats(queries)
+        report["build_s"] = build
+        reports.append(report)
+    return reports
+
+
+def write_benchmark(rows, json_path=None, csv_path=None):
+    if json_path is not None:
+        with open(json_path, "w") as f:
+            json.dump({"results": rows, "crossovers": crossover_points(rows)}, f, indent=2)
+    if csv_path is not None:
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark KD-tree nearest neighbor queries against brute force.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**2, 10**3, 10**4, 10**5, 10**6])
+    parser.add_argument("--dims", type=int, nargs="+", default=list(range(2, 9)))
+    parser.add_argument("--distributions", nargs="+", default=["uniform", "clustered"])
+    parser.add_argument("--single", type=int, default=100, help="number of single queries")
+    parser.add_argument("--batch", type=int, default=1000, help="number of batched queries")
+    parser.add_argument("--leaf-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1, help="processes used to build the trees")
+    parser.add_argument("--split", default="median", choices=SPLIT_RULES, help="split rule of the benchmarked trees")
+    parser.add_argument("--compare-splits", action="store_true",
+                        help="report tree statistics for every split rule instead of timing queries")
+    parser.add_argument("--json", default="kd_tree_benchmark.json")
+    parser.add_argument("--csv", default="kd_tree_benchmark.csv")
+    args = parser.parse_args()
+
+    if args.compare_splits:
+        rng = np.random.default_rng(0)
+        reports = []
+        for distribution in args.distributions:
+            for dim in args.dims:
+                for n in args.sizes:
+                    points = _benchmark_points(rng, n, dim, distribution)
+                    queries = _benchmark_points(rng, args.single, dim, distribution)
+                    for report in compare_splits(points, queries, leaf_size=args.leaf_size):
+                        reports.append({"distribution": distribution, "dim": dim, "n": n, **report})
+                        # No median aspect when every leaf cell is degenerate
+                        aspect = report["aspect_median"]
+                        aspect = "n/a" if aspect is None else f"{aspect:.2f}"
+                        print(f"{distribution:>9} dim={dim} n={n} {report['split']:>16}: "
+                              f"depth={report['max_depth']} aspect={aspect} "
+                              f"visited={report['nodes_visited']:.1f} build={report['build_s']:.3f}s")
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+        raise SystemExit
+
+    rows = benchmark(args.sizes, args.dims, args.distributions, args.single, args.batch, args.leaf_size,
+                     workers=args.workers, split=args.split)
+    write_benchmark(rows, args.json, args.csv)
+    for c in crossover_points(rows):
+        print(f"{c['distribution']:>9} dim={c['dim']} {c['mode']:>6}: crossover at n={c['n']}")
@@ -1,5 +1,10 @@
 from manimlib import *
 from klampt.math import so3
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from quality import scene_quality
 
 manim_config.camera.background_color = WHITE
 
@@ -63,7 +68,7 @@ class Cube(Group):
                 Cube.CUBE_VERTICES[i] * self.scale_val,
                 Cube.CUBE_VERTICES[j] * self.scale_val,
                 color=BLACK,
-                stroke_width=1.0 * self.scale_val,
+                stroke_width=scene_quality(self.scene).stroke(1.0 * self.scale_val),
             )
             self.edges.append(edge)
             self.add(edge)
@@ -88,10 +93,11 @@ class Cube(Group):
         self.vertex_idx = vertex_idx.copy()
 
         # Visualize corners
+        resolution = scene_quality(self.scene).surface(Sphere)
         for idx, pos in enumerate(Cube.CUBE_VERTICES):
             o = 1.0 if idx in self.vertex_idx else 0.0
             r = 0.05 * self.scale_val
-            dot = Sphere(radius=r, opacity=o, color="#62AFE0")
+            dot = Sphere(radius=r, opacity=o, color="#62AFE0", **resolution)
             # Get the rotation frame of the group
             dot_pos = np.array(so3.apply(self.rotation_matrix, pos)) * self.scale_val + self.get_center()
             dot.move_to(dot_pos)
@@ -109,6 +115,7 @@ class Cube(Group):
     def add_triangles(self, triangles):
         self.triangles_idx = triangles.copy()
 
+        stroke_width = scene_quality(self.scene).stroke(1.0)
         for t in triangles:
             triangle_points = []
             for edge in t:
@@ -116,7 +123,7 @@ class Cube(Group):
                 v1 = Cube.CUBE_VERTICES[e[0]] * self.scale_val
                 v2 = Cube.CUBE_VERTICES[e[1]] * self.scale_val
                 triangle_points.append((v1 + v2)/2.0)
-            triangle = Polygon(triangle_points[0], triangle_points[1], triangle_points[2], fill_color=YELLOW, fill_opacity=1.0, stroke_color=BLACK, stroke_width=1.0)
+            triangle = Polygon(triangle_points[0], triangle_points[1], triangle_points[2], fill_color=YELLOW, fill_opacity=1.0, stroke_color=BLACK, stroke_width=stroke_width)
             self.triangles.append(triangle)
             self.add(triangle)
 
@@ -179,7 +186,7 @@ class MarchingCubes(InteractiveScene):
         self._show_base_cases()
 
         # Sphere
-        sphere = Sphere(radius=1, color=BLUE, opacity=0.2)
+        sphere = Sphere(radius=1, color=BLUE, opacity=0.2, **scene_quality(self).surface(Sphere))
         self.shape = sphere
 
         # Axes
@@ -1,12 +1,42 @@
 from manimlib import *
+import os
+import shutil
+import sys
+import tempfile
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from root_finding import (
+    BRACKETING, CATALOGUE, METHODS, benchmark, benchmark_starts, newton, newton_basins, newton_system, run_method,
+)
 
 manim_config.camera.background_color = "#FFFFFF"
 class NewtonsMethod1D(Scene):
+    # Label of f, which is defined below with its derivative df (set df to
+    # None to use finite differences)
+    LABEL = r"f(x) = x^2 - 1"
+    # Starting points run together, and the one whose trace is animated
+    STARTS = [2.0]
+    TRACE = 0
+    ITERATIONS = 5
+    # Graph window and the x extent of the tangent lines
+    X_RANGE = (-1, 3, 1)
+    Y_RANGE = (-2, 4, 1)
+    TANGENT_RANGE = (-0.5, 2.5)
+
+    @staticmethod
+    def f(x):
+        return x**2 - 1
+
+    @staticmethod
+    def df(x):
+        return 2 * x
+
     def construct(self):
         # Set graph plane
         plane = NumberPlane(
-            x_range=(-1, 3, 1),
-            y_range=(-2, 4, 1),
+            x_range=self.X_RANGE,
+            y_range=self.Y_RANGE,
             height=5,
             width=5,
             background_line_style={
@@ -22,58 +52,27 @@ class NewtonsMethod1D(Scene):
         plane.shift(LEFT * 3)
 
         # Functions
-        def f(x):
-            return x**2 - 1
-        
-        def f_zero():
-            return 1
+        f = self.f
 
-        def df(x):
-            return 2 * x
+        # Run every start to convergence, the iterates shown are the first
+        # steps of the chosen trace and its error is measured to where it ends
+        result = newton(f, np.array(self.STARTS, dtype=float), self.df)
+        trace = result.lane(self.TRACE)
+        root = trace[-1]
 
         # Function graph
         graph = plane.get_graph(f, color=BLUE)
-        label = Tex(r"f(x) = x^2 - 1", fill_color=BLACK).next_to(plane, UP, buff=0.5)
+        label = Tex(self.LABEL, fill_color=BLACK).next_to(plane, UP, buff=0.5)
         x_label = Tex("x", fill_color=BLACK).scale(0.7).next_to(plane.axes[0].get_end(), RIGHT, buff=0.2)
         y_label = Tex("y", fill_color=BLACK).scale(0.7).next_to(plane.axes[1].get_end(), UP, buff=0.2)
         plane_label = VGroup(label, x_label, y_label)
 
-        # Error plane
-        error_plane = NumberPlane(
-            x_range=(-1, 5, 1),
-            y_range=(-10, 1, 2),
-            height=5,
-            width=6,
-            background_line_style={
-                "stroke_width": 0  # Hides the grid lines
-            },
-            axis_config={
-                "stroke_color": BLACK,
-                "include_tip": True,
-                "include_ticks": True
-            },
-        )
-
-        error_plane.shift(RIGHT * 3.3)
-        label = TexText(r"\textit{Error Graph}", fill_color=BLACK).next_to(error_plane, UP, buff=0.5)
-        x_label = Tex("Iterations", fill_color=BLACK).scale(0.7).next_to(error_plane.axes[0].get_center(), UP, buff=0.5)
-        y_label = Tex("Error", fill_color=BLACK).scale(0.7).rotate(PI/2).next_to(error_plane.axes[1].get_center(), LEFT, buff=1.0)
-        error_label = VGroup(label, x_label, y_label)
-        y_axis_labels = {
-             -2: "10^{-2}",
-             -4: "10^{-4}",
-             -6: "10^{-6}",
-             -8: "10^{-8}",
-        }
-
-        for y_val, label_text in y_axis_labels.items():
-            tick = error_plane.y_axis.number_to_point(y_val)
-            label = Tex(rf"{label_text}", fill_color=BLACK, font_size=30).next_to(tick, LEFT, buff=0.2)
-            error_label.add(label)
+        x_current = trace[0]
+        num_iterations = min(self.ITERATIONS, len(trace) - 1)
 
-        x0 = 2.0
-        x_current = x0
-        num_iterations = 5
+        # Error plane
+        log_errors = np.log10(np.abs(trace[:num_iterations] - root))
+        error_plane, error_label = self._create_error_plane(log_errors, num_iterations)
 
         dot = Dot(fill_color=YELLOW, z_index=1).move_to(plane.c2p(x_current, 0))
         
@@ -93,8 +92,9 @@ class NewtonsMethod1D(Scene):
 
         for i in range(num_iterations):
             fx = f(x_current)
-            dfx = df(x_current)
-            x_next = x_current - fx / dfx
+            x_next = trace[i + 1]
+            # Slope of the step the solver took, also for finite differences
+            dfx = fx / (x_current - x_next)
 
             # Dot and label on x-axis
             intersection_dot = Dot(plane.c2p(x_current, 0), fill_color=MAROON, z_index=2)
@@ -109,7 +109,7 @@ class NewtonsMethod1D(Scene):
             )
 
             # Tangent line: y - fx = dfx(x - x_current)
-            x_min, x_max = -0.5, 2.5
+            x_min, x_max = self.TANGENT_RANGE
             y_min = fx + dfx * (x_min - x_current)
             y_max = fx + dfx * (x_max - x_current)
             tangent_line = Line(
@@ -119,7 +119,7 @@ class NewtonsMethod1D(Scene):
             )
 
             # Animate step
-            error = Dot(fill_color=RED, point=error_plane.c2p(i, math.log10(x_current - f_zero())))
+            error = Dot(fill_color=RED, point=error_plane.c2p(i, log_errors[i]))
             self.play(FadeIn(intersection_dot), FadeIn(intersection_label), FadeIn(error))
             if i > 0:
                 self.play(
@@ -141,4 +141,383 @@ class NewtonsMethod1D(Scene):
 
             x_current = x_next
 
-        self.wait(2)
\ No newline at end of file
+        self.wait(2)
+
+    def _create_error_plane(self, log_errors, num_iterations):
+        """Log error graph over the iterations, labelled at automatically spaced decades."""
+        low, high, step = decade_ticks(log_errors)
+        error_plane = NumberPlane(
+            x_range=(-1, max(num_iterations, 1), 1),
+            y_range=(low, high, step),
+            height=5,
+            width=6,
+            background_line_style={
+                "stroke_width": 0  # Hides the grid lines
+            },
+            axis_config={
+                "stroke_color": BLACK,
+                "include_tip": True,
+                "include_ticks": True
+            },
+        )
+
+        error_plane.shift(RIGHT * 3.3)
+        label = TexText(r"\textit{Error Graph}", fill_color=BLACK).next_to(error_plane, UP, buff=0.5)
+        x_label = Tex("Iterations", fill_color=BLACK).scale(0.7).next_to(error_plane.axes[0].get_center(), UP, buff=0.5)
+        y_label = Tex("Error", fill_color=BLACK).scale(0.7).rotate(PI/2).next_to(error_plane.axes[1].get_center(), LEFT, buff=1.0)
+        error_label = VGroup(label, x_label, y_label)
+
+        # 10^0 sits on the iterations axis, label the other decades
+        for exponent in range(low, high, step):
+            if exponent == 0:
+                continue
+            tick = error_plane.y_axis.number_to_point(exponent)
+            label = Tex(rf"10^{{{exponent}}}", fill_color=BLACK, font_size=30).next_to(tick, LEFT, buff=0.2)
+            error_label.add(label)
+        return error_plane, error_label
+
+
+def decade_ticks(log_errors, max_ticks=5):
+    """
+    Axis range (low, high, step) in decades for log10 errors. It covers the
+    finite errors and 0, with step chosen so at most max_ticks decades
+    below 0 are labelled, and low a multiple of step.
+    """
+    log_errors = np.asarray(log_errors, dtype=float)
+    finite = log_errors[np.isfinite(log_errors)]
+    low = min(np.floor(finite.min()), -1) if finite.size else -1
+    high = max(np.ceil(finite.max()), 0) if finite.size else 0
+    step = max(1, int(np.ceil(-low / max_ticks)))
+    low = int(np.floor((low - 0.5) / step) * step)
+    return low, int(high) + 1, step
+
+
+class NewtonsMethod2D(NewtonsMethod1D):
+    # Inverse kinematics of a planar two-link arm: the joint angles that put
+    # the end of the arm on TARGET, a square system in (theta_1, theta_2)
+    LINKS = (2.0, 1.5)
+    TARGET = (2.0, 1.5)
+    STARTS = [(-2.5, 2.5), (2.6, -1.0), (-1.0, -2.5), (0.4, 0.3)]
+    COLORS = [RED, GREEN, PURPLE, ORANGE]
+    ITERATIONS = 8
+    # Contours of log10 of the residual norm over the joint angle square
+    LEVELS = (-1.0, -0.5, 0.0, 0.25, 0.5)
+    GRID = 200
+
+    def F(self, q):
+        """Distance from the end of the arm to the target, (n, 2) angles to (n, 2) residuals."""
+        (l1, l2), (tx, ty) = self.LINKS, self.TARGET
+        a, b = q[:, 0], q[:, 0] + q[:, 1]
+        return np.stack([l1 * np.cos(a) + l2 * np.cos(b) - tx, l1 * np.sin(a) + l2 * np.sin(b) - ty], axis=-1)
+
+    def jacobian(self, q):
+        l1, l2 = self.LINKS
+        a, b = q[:, 0], q[:, 0] + q[:, 1]
+        return np.stack([
+            np.stack([-l1 * np.sin(a) - l2 * np.sin(b), -l2 * np.sin(b)], axis=-1),
+            np.stack([l1 * np.cos(a) + l2 * np.cos(b), l2 * np.cos(b)], axis=-1),
+        ], axis=-2)
+
+    def construct(self):
+        """
+        Run Newton's method from several joint angle guesses at once and
+        animate the iterates over contours of the residual, next to the log
+        error of every guess.
+        """
+        plane = NumberPlane(
+            x_range=(-4, 4, 1),
+            y_range=(-4, 4, 1),
+            height=5,
+            width=5,
+            background_line_style={
+                "stroke_width": 0  # Hides the grid lines
+            },
+            axis_config={
+                "stroke_color": BLACK,
+                "include_tip": True,
+                "include_ticks": True
+            }
+        )
+        plane.add_coordinate_labels()
+        plane.shift(LEFT * 3)
+        label = Tex(r"\|p(\theta) - p^*\|", fill_color=BLACK).next_to(plane, UP, buff=0.5)
+        x_label = Tex(r"\theta_1", fill_color=BLACK).scale(0.7).next_to(plane.axes[0].get_end(), RIGHT, buff=0.2)
+        y_label = Tex(r"\theta_2", fill_color=BLACK).scale(0.7).next_to(plane.axes[1].get_end(), UP, buff=0.2)
+        plane_label = VGroup(label, x_label, y_label)
+
+        # Residual contours, solved on a grid in one batch
+        angles = np.linspace(-PI, PI, self.GRID)
+        grid = np.stack(np.meshgrid(angles, angles), axis=-1).reshape(-1, 2)
+        with np.errstate(divide="ignore"):
+            values = np.log10(np.linalg.norm(self.F(grid), axis=-1)).reshape(self.GRID, self.GRID)
+        contours = VGroup(*[
+            self._merge_lines(
+                self._to_plane(plane, contour_segments(values, angles, angles, level)),
+                stroke_color=BLUE, stroke_width=2, stroke_opacity=1.0 - 0.6 * k / max(len(self.LEVELS) - 1, 1),
+            )
+            for k, level in enumerate(self.LEVELS)
+        ])
+
+        result = newton_system(self.F, np.array(self.STARTS, dtype=float), self.jacobian)
+        steps = int(min(self.ITERATIONS, result.iterations.max()))
+        trace = result.trace[:steps + 1]
+        residuals = np.linalg.norm(self.F(trace.reshape(-1, 2)), axis=-1).reshape(steps + 1, -1)
+        with np.errstate(divide="ignore"):
+            log_errors = np.log10(residuals)
+        # Joint angles are shown wrapped to the contour square
+        wrapped = np.angle(np.exp(1j * trace))
+        points = self._to_plane(plane, wrapped)
+
+        error_plane, error_label = self._create_error_plane(log_errors, steps + 1)
+        dots = [Dot(points[0, k], fill_color=color, z_index=2) for k, color in enumerate(self.COLORS)]
+
+        self.play(FadeIn(plane),
+                  ShowCreation(contours),
+                  Write(plane_label),
+                  *[FadeIn(dot, scale=0.5) for dot in dots],
+                  FadeIn(error_plane),
+                  Write(error_label),
+                  run_time=2.0)
+        self.wait()
+
+        for i in range(steps + 1):
+            errors = [
+                Dot(error_plane.c2p(i, log_errors[i, k]), fill_color=color, radius=0.06)
+                for k, color in enumerate(self.COLORS)
+                if np.isfinite(log_errors[i, k])
+            ]
+            if errors:
+                self.play(*[FadeIn(error) for error in errors], run_time=0.5)
+            if i == steps:
+                break
+            # A step that wraps around the square jumps instead of drawing a line
+            moves, paths = [], []
+            for k, color in enumerate(self.COLORS):
+                if np.array_equal(trace[i, k], trace[i + 1, k]):
+                    continue
+                moves.append(dots[k].animate.move_to(points[i + 1, k]))
+                if np.all(np.abs(wrapped[i + 1, k] - wrapped[i, k]) < PI):
+                    paths.append(ShowCreation(Line(points[i, k], points[i + 1, k], stroke_color=color)))
+            self.play(*moves, *paths)
+
+        self.wait(2)
+
+    def _to_plane(self, plane, coords):
+        """Scene points of an array of plane coordinates, the plane map is affine."""
+        origin = plane.c2p(0, 0)
+        x_unit, y_unit = plane.c2p(1, 0) - origin, plane.c2p(0, 1) - origin
+        coords = np.asarray(coords, dtype=float)
+        return origin + coords[..., :1] * x_unit + coords[..., 1:2] * y_unit
+
+    def _merge_lines(self, segments, **style):
+        # Any number of line segments as a single mobject
+        lines = VMobject(**style)
+        for start, end in segments:
+            lines.start_new_path(start)
+            lines.add_line_to(end)
+        return lines
+
+
+class RootFindingComparison(NewtonsMethod1D):
+    # Row of the root finding benchmark to show, indexed like the rows
+    # printed by root_finding.py: every method on the row's function is run
+    # from the same start and the row's method is drawn on top
+    ROW = 10
+    # Index of the start into the benchmark draw, None for the first start
+    # the row's method solves
+    START = None
+    NUM_STARTS = 2000
+    ITERATIONS = 30
+    # Errors above 10^MAX_LOG_ERROR, diverging methods, run along the top
+    MAX_LOG_ERROR = 2
+    COLORS = {"newton": RED, "secant": BLUE, "halley": GREEN, "brent": PURPLE, "bisection": ORANGE}
+
+    def construct(self):
+        """
+        Log error of every method on one benchmark function from a shared
+        start, drawn side by side with the benchmark statistics of each.
+        """
+        names = list(CATALOGUE)
+        function = CATALOGUE[names[self.ROW // len(METHODS)]]
+        picked = METHODS[self.ROW % len(METHODS)]
+        rows = {row["method"]: row for row in benchmark([function.name], METHODS, self.NUM_STARTS)}
+
+        points, brackets = benchmark_starts(function, self.NUM_STARTS)
+        start = self.START
+        if start is None:
+            solved = run_method(picked, function, brackets if picked in BRACKETING else points, keep_trace=False)
+            start = int(np.argmax(solved.converged & (np.abs(solved.x - function.root) <= 1e-4 * max(1.0, abs(function.root)))))
+
+        curves = {}
+        for method in METHODS:
+            starts = (brackets if method in BRACKETING else points)[start:start + 1]
+            trace = run_method(method, function, starts, max_iter=self.ITERATIONS).lane(0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                curves[method] = np.minimum(np.log10(np.abs(trace - function.root)), self.MAX_LOG_ERROR)
+        num_iterations = max(len(curve) for curve in curves.values())
+
+        error_plane, error_label = self._create_error_plane(np.concatenate(list(curves.values())), num_iterations)
+        VGroup(error_plane, error_label).shift(LEFT * 6.3)
+        title = Tex(function.label, fill_color=BLACK)
+        title.next_to(error_plane, UP, buff=0.5).set_x(3.3)
+
+        # Only the finite errors are drawn, an exact root ends its curve
+        lines, legend = VGroup(), VGroup()
+        for method in METHODS:
+            log_errors = curves[method]
+            steps = np.flatnonzero(np.isfinite(log_errors))
+            line = VMobject(
+                stroke_color=self.COLORS[method],
+                stroke_width=6 if method == picked else 3,
+                stroke_opacity=1.0 if method == picked else 0.6,
+            )
+            line.set_points_as_corners([error_plane.c2p(i, log_errors[i]) for i in steps])
+            lines.add(line)
+
+            row = rows[method]
+            entry = VGroup(
+                Line(ORIGIN, RIGHT * 0.5, stroke_color=self.COLORS[method], stroke_width=6),
+                TexText(
+                    rf"{method}: {row['iterations_mean']:.1f} iterations, "
+                    rf"{row['evaluations_mean']:.1f} evaluations, {100 * row['failure_rate']:.1f}\% failed",
+                    fill_color=BLACK, font_size=24,
+                ),
+            ).arrange(RIGHT, buff=0.2)
+            if method != picked:
+                entry.set_opacity(0.6)
+            legend.add(entry)
+        legend.arrange(DOWN, aligned_edge=LEFT, buff=0.35).next_to(title, DOWN, buff=0.6)
+        note = TexText(
+            rf"Means over {self.NUM_STARTS} random starts", fill_color=BLACK, font_size=24,
+        ).next_to(legend, DOWN, buff=0.5)
+
+        self.play(FadeIn(error_plane), Write(error_label), Write(title), run_time=2.0)
+        self.play(LaggedStart(*[FadeIn(entry) for entry in legend]), FadeIn(note))
+        self.wait()
+        # Every curve is drawn at the same iterations per second, the short
+        # ones finish early
+        self.play(
+            *[ShowCreation(line, rate_func=lambda t, end=(len(curves[m]) - 1) / max(num_iterations - 1, 1): min(t / max(end, 1e-6), 1.0))
+              for line, m in zip(lines, METHODS)],
+            run_time=4.0,
+        )
+        self.wait(2)
+
+
+def contour_segments(values, xs, ys, level):
+    """
+    Segments of the level set of a grid of values, values[j, i] being at
+    (xs[i], ys[j]), found by marching squares for all cells at once.
+    Returns an (n, 2, 2) array of (x, y) endpoints.
+    """
+    v = np.asarray(values, dtype=float) - level
+    x, y = np.meshgrid(xs, ys)
+    # Corners of every cell counterclockwise from bottom left, edge k runs
+    # from corner k to corner k + 1
+    corners = [(slice(None, -1), slice(None, -1)), (slice(None, -1), slice(1, None)),
+               (slice(1, None), slice(1, None)), (slice(1, None), slice(None, -1))]
+    crossings, points = [], []
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for k in range(4):
+            a, b = corners[k], corners[(k + 1) % 4]
+            crossings.append((v[a] > 0) != (v[b] > 0))
+            t = v[a] / (v[a] - v[b])
+            points.append(np.stack([x[a] + t * (x[b] - x[a]), y[a] + t * (y[b] - y[a])], axis=-1))
+    crossings = np.stack(crossings, axis=-1)
+    points = np.stack(points, axis=-2)
+    count = crossings.sum(axis=-1)
+
+    # Two crossings are joined directly
+    two = count == 2
+    edges = np.argsort(~crossings[two], axis=-1, kind="stable")[:, :2]
+    segments = [np.take_along_axis(points[two], edges[:, :, None], axis=1)]
+
+    # Saddles join the edge pairs around the two corners whose sign differs
+    # from the cell center
+    four = count == 4
+    center = sum(v[corner] for corner in corners)[four] / 4 > 0
+    bottom_left = v[corners[0]][four] > 0
+    cut = np.where((center == bottom_left)[:, None], [[0, 1, 2, 3]], [[3, 0, 1, 2]])
+    saddles = np.take_along_axis(points[four], cut[:, :, None], axis=1)
+    segments.append(saddles.reshape(-1, 2, 2))
+    return np.concatenate(segments)
+
+
+def basin_image(basins, iterations, colors, max_iter):
+    """
+    RGB image of Newton basins, each root in its color, darker the more
+    iterations a pixel took and black where it did not converge.
+    """
+    palette = np.array([[int(c[i:i + 2], 16) for i in (1, 3, 5)] for c in colors] + [[0, 0, 0]], dtype=float)
+    shade = 1.0 - 0.75 * np.sqrt(np.minimum(iterations, max_iter) / max_iter)
+    # Index -1 (no root) picks the black entry at the end of the palette
+    rgb = palette[basins] * shade[..., None]
+    return rgb.astype(np.uint8)
+
+
+class NewtonBasins(Scene):
+    # Polynomial coefficients, highest power first, and its label
+    COEFFICIENTS = [1, 0, 0, -1]
+    LABEL = r"f(z) = z^3 - 1"
+    # One color per root, in np.roots order
+    COLORS = ["#E07A5F", "#3D85C6", "#81B29A"]
+    MAX_ITER = 40
+    # Side of the square image in pixels at full resolution, and the
+    # coarser block sizes shown first while zooming in
+    RESOLUTION = 720
+    REFINEMENTS = (8, 4, 2, 1)
+    WORKERS = 1
+    # Windows of the complex plane as (center, width), zoomed into in turn.
+    # -2^(-1/3) is sent to 0 by one Newton step, so it sits on the boundary
+    # between all three basins
+    VIEWS = [(0j, 4.0), (-0.7937 + 0j, 0.8), (-0.7937 + 0j, 0.12)]
+    IMAGE_HEIGHT = 7.0
+
+    def construct(self):
+        """
+        Color every pixel by the root Newton's method reaches from it, then
+        zoom in on the boundary between the basins. Each view is computed
+        coarse first and refined in place.
+        """
+        self.image_dir = tempfile.mkdtemp(prefix="newton_basins_")
+        label = Tex(self.LABEL, fill_color=BLACK).to_corner(UL)
+
+        image = None
+        for k, (center, width) in enumerate(self.VIEWS):
+            if image is not None:
+                # Blow up the last image around the next window, then refine
+                prev_center, prev_width = self.VIEWS[k - 1]
+                offset = (center - prev_center) / prev_width * self.IMAGE_HEIGHT
+                point = np.array([offset.real, offset.imag, 0.0])
+                self.play(
+                    image.animate.scale(prev_width / width, about_point=point).shift(-point),
+                    run_time=2,
+                )
+            for block in self.REFINEMENTS:
+                refined = self._basin_image(center, width, block)
+                self.play(FadeIn(refined), run_time=0.5 if image is not None else 1.0)
+                if image is not None:
+                    self.remove(image)
+                image = refined
+                self.add(label)
+            self.wait()
+
+    def tear_down(self):
+        # Images are read when first rendered. With skipped animations (-s)
+        # that is the last frame, written by the parent's tear_down
+        super().tear_down()
+        shutil.rmtree(self.image_dir, ignore_errors=True)
+
+    def _basin_image(self, center, width, block):
+        """Image mobject of a window solved at one pixel per block of screen pixels."""
+        size = max(1, self.RESOLUTION // block)
+        basins, iterations = newton_basins(
+            self.COEFFICIENTS, center, width, (size, size),
+            max_iter=self.MAX_ITER, workers=self.WORKERS,
+        )
+        rgb = basin_image(basins, iterations, self.COLORS, self.MAX_ITER)
+        # Blow coarse images up to full size so they show as sharp blocks
+        rgb = np.repeat(np.repeat(rgb, block, axis=0), block, axis=1)
+        path = os.path.join(self.image_dir, f"basins_{center.real:+.6f}{center.imag:+.6f}j_{width:.6f}_{block}.png")
+        Image.fromarray(rgb).save(path)
+        return ImageMobject(path, height=self.IMAGE_HEIGHT)
@@ -0,0 +1,52 @@
+import os
+
+# Level of detail for the 3D mobjects the scenes create. Final renders keep
+# manimgl's default tessellation, preview renders (-l) use coarser surfaces.
+# Set ANIMATION_QUALITY to "preview" or "final" to pick one explicitly.
+
+# manimgl's default (u, v) resolutions of the surfaces used here
+DEFAULT_RESOLUTIONS = {
+    "Sphere": (101, 51),
+    "Torus": (101, 101),
+    "Cylinder": (101, 11),
+    "Cone": (101, 11),
+    "Line3D": (21, 25),
+}
+
+
+class QualityProfile():
+    def __init__(self, name, resolution_scale=1.0, stroke_scale=1.0):
+        self.name = name
+        self.resolution_scale = resolution_scale
+        self.stroke_scale = stroke_scale
+
+    def __repr__(self):
+        return f"QualityProfile({self.name})"
+
+    def surface(self, surface_class):
+        """Keyword arguments setting the resolution of a surface class, none at full quality."""
+        resolution = DEFAULT_RESOLUTIONS.get(surface_class.__name__)
+        if resolution is None or self.resolution_scale == 1.0:
+            return {}
+        return {"resolution": tuple(max(2, int(round(r * self.resolution_scale))) for r in resolution)}
+
+    def stroke(self, width):
+        return width * self.stroke_scale
+
+
+PROFILES = {
+    "final": QualityProfile("final"),
+    # About a tenth of the vertices, thin lines are widened so they don't
+    # alias away at the preview pixel size
+    "preview": QualityProfile("preview", resolution_scale=0.3, stroke_scale=1.5),
+}
+
+
+def scene_quality(scene):
+    """Profile for a scene, preview below 720 pixels tall unless ANIMATION_QUALITY is set."""
+    name = os.environ.get("ANIMATION_QUALITY")
+    if name is None:
+        name = "preview" if scene.camera.get_pixel_height() < 720 else "final"
+    if name not in PROFILES:
+        raise ValueError(f"Unknown ANIMATION_QUALITY {name!r}, expected one of {sorted(PROFILES)}")
+    return PROFILES[name]
@@ -0,0 +1,124 @@
+import numpy as np
+
+# Unit quaternions stored as (..., 4) arrays in (w, x, y, z) order. Every
+# function works on whole arrays of orientations at once, leading axes
+# broadcast like any other NumPy operation.
+
+AXES = {"x": 0, "y": 1, "z": 2}
+
+
+def identity(shape=()):
+    """Identity quaternions of the given leading shape."""
+    q = np.zeros(np.broadcast_shapes(shape) + (4,))
+    q[..., 0] = 1.0
+    return q
+
+
+def multiply(q, r):
+    """Hamilton product q r, the rotation r followed by q."""
+    q, r = np.asarray(q, dtype=float), np.asarray(r, dtype=float)
+    w1, x1, y1, z1 = np.moveaxis(q, -1, 0)
+    w2, x2, y2, z2 = np.moveaxis(r, -1, 0)
+    return np.stack([
+        w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+        w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+        w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+        w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+    ], axis=-1)
+
+
+def conjugate(q):
+    """Inverse of unit quaternions."""
+    return np.asarray(q, dtype=float) * np.array([1.0, -1.0, -1.0, -1.0])
+
+
+def normalize(q):
+    q = np.asarray(q, dtype=float)
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def from_axis_angle(axis, angle):
+    """Rotations by angle about axis, axis is normalized here."""
+    axis = np.asarray(axis, dtype=float)
+    axis = axis / np.linalg.norm(axis, axis=-1, keepdims=True)
+    half = 0.5 * np.asarray(angle, dtype=float)[..., None]
+    vector = np.sin(half) * axis
+    return np.concatenate([np.broadcast_to(np.cos(half), vector.shape[:-1] + (1,)), vector], axis=-1)
+
+
+def from_euler(angles, order="xyz"):
+    """
+    Rotations for (..., 3) arrays of Euler angles in intrinsic order, so
+    "xyz" turns about X, then about the Y axis carried by that turn, then
+    about the carried Z axis, like a gimbal with X on the outside. Any of the
+    12 conventions works, "zyx" or "zxz" for example.
+    """
+    angles = np.asarray(angles, dtype=float)
+    q = None
+    for k, axis in enumerate(order):
+        turn = from_axis_angle(np.identity(3)[AXES[axis]], angles[..., k])
+        q = turn if q is None else multiply(q, turn)
+    return q
+
+
+def to_matrix(q):
+    """(..., 3, 3) rotation matrices of unit quaternions."""
+    w, x, y, z = np.moveaxis(np.asarray(q, dtype=float), -1, 0)
+    return np.stack([
+        np.stack([1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)], axis=-1),
+        np.stack([2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)], axis=-1),
+        np.stack([2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)], axis=-1),
+    ], axis=-2)
+
+
+def rotate(q, v):
+    """Rotate (..., 3) vectors by unit quaternions."""
+    return np.einsum("...ij,...j->...i", to_matrix(q), v)
+
+
+def exp(v):
+    """Unit quaternions of rotation vectors (axis times angle)."""
+    v = np.asarray(v, dtype=float)
+    angle = np.linalg.norm(v, axis=-1, keepdims=True)
+    # sin(a / 2) / a tends to 1 / 2, use its series for tiny angles
+    small = angle < 1e-8
+    scale = np.where(small, 0.5 - angle ** 2 / 48, np.sin(0.5 * angle) / np.where(small, 1.0, angle))
+    return np.concatenate([np.cos(0.5 * angle), scale * v], axis=-1)
+
+
+def log(q):
+    """Rotation vectors (axis times angle, angle in [0, pi]) of unit quaternions."""
+    q = np.asarray(q, dtype=float)
+    # q and -q are the same rotation, take the one with w >= 0
+    q = np.where(q[..., :1] < 0, -q, q)
+    s = np.linalg.norm(q[..., 1:], axis=-1, keepdims=True)
+    angle = 2 * np.arctan2(s, q[..., :1])
+    small = s < 1e-8
+    scale = np.where(small, 2.0 / np.maximum(q[..., :1], 1e-300), angle / np.where(small, 1.0, s))
+    return scale * q[..., 1:]
+
+
+def angle_between(q, r):
+    """Rotation angle taking q to r."""
+    return np.linalg.norm(log(multiply(conjugate(q), r)), axis=-1)
+
+
+def slerp(q0, q1, t):
+    """
+    Spherical linear interpolation from q0 to q1 at times t, along the
+    shorter arc. q0, q1 and t broadcast, with t carrying no quaternion axis,
+    so one pair of endpoints and an array of t gives the whole path.
+    """
+    q0, q1 = np.asarray(q0, dtype=float), np.asarray(q1, dtype=float)
+    t = np.asarray(t, dtype=float)[..., None]
+    dot = np.sum(q0 * q1, axis=-1, keepdims=True)
+    q1 = np.where(dot < 0, -q1, q1)
+    dot = np.abs(dot)
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.sin(theta)
+    # Nearly equal endpoints, fall back to normalized linear interpolation
+    close = sin_theta < 1e-6
+    safe = np.where(close, 1.0, sin_theta)
+    w0 = np.where(close, 1 - t, np.sin((1 - t) * theta) / safe)
+    w1 = np.where(close, t, np.sin(t * theta) / safe)
+    return normalize(w0 * q0 + w1 * q1)
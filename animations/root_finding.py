@@ -0,0 +1,553 @@
+import numpy as np
+import argparse
+import csv
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+class RootResult():
+    """
+    A root finding method run on many starting points at once. Every lane
+    keeps its own state: converged, failed (a non-finite value or step, a
+    zero derivative or a start that brackets no root), or still running
+    when the iteration limit was hit. trace[k] holds the estimate of every
+    lane after k steps, lanes stop moving once they stop, so trace[-1]
+    equals x.
+    """
+    def __init__(self, x, fx, converged, failed, iterations, evaluations, trace=None):
+        self.x = x
+        self.fx = fx
+        self.converged = converged
+        self.failed = failed
+        self.iterations = iterations
+        self.evaluations = evaluations
+        self.trace = trace
+
+    def __repr__(self):
+        return (
+            f"RootResult({self.converged.size} lanes, {int(self.converged.sum())} converged, "
+            f"{int(self.failed.sum())} failed, {int(self.iterations.max(initial=0))} iterations)"
+        )
+
+    def lane(self, index):
+        """Iterates of one starting point (a flat index into x0), up to the step where it stopped."""
+        if self.trace is None:
+            raise ValueError("Run the solver with keep_trace=True to get the iterates")
+        steps = self.iterations.flat[index]
+        trace = self.trace[: steps + 1]
+        # Flatten the lane axes, keeping the point axis of systems
+        point_shape = trace.shape[1 + self.iterations.ndim:]
+        return trace.reshape((steps + 1, self.iterations.size) + point_shape)[:, index]
+
+
+class _Lanes():
+    """Bookkeeping of the lanes of a vectorized solver, which ones still run and what they cost."""
+    def __init__(self, x, keep_trace):
+        n = len(x)
+        self.converged = np.zeros(n, dtype=bool)
+        self.failed = np.zeros(n, dtype=bool)
+        self.iterations = np.zeros(n, dtype=int)
+        self.evaluations = np.zeros(n, dtype=int)
+        self.running = np.arange(n)
+        self.trace = [x.copy()] if keep_trace else None
+
+    def stop(self, done, bad):
+        """Retire the running lanes marked done (converged) or bad (failed)."""
+        self.converged[self.running[done]] = True
+        self.failed[self.running[bad]] = True
+        self.running = self.running[~(done | bad)]
+
+    def record(self, x):
+        if self.trace is not None:
+            self.trace.append(x.copy())
+
+    def result(self, f, x, shape):
+        """RootResult with the lanes reshaped to shape and f evaluated at the estimates."""
+        point_shape = x.shape[1:]
+        self.failed |= ~np.isfinite(x).reshape(len(x), -1).all(axis=-1)
+        ok = ~self.failed
+        values = f(x[ok])
+        fx = np.full((len(x),) + values.shape[1:], np.nan, dtype=values.dtype)
+        fx[ok] = values
+        return RootResult(
+            x.reshape(shape + point_shape),
+            fx.reshape(shape + fx.shape[1:]),
+            self.converged.reshape(shape),
+            self.failed.reshape(shape),
+            self.iterations.reshape(shape),
+            self.evaluations.reshape(shape),
+            np.stack(self.trace).reshape((-1,) + shape + point_shape) if self.trace is not None else None,
+        )
+
+
+def finite_difference(f):
+    """Central difference derivative of an elementwise f, the step scaled to x."""
+    def df(x):
+        h = np.cbrt(np.finfo(float).eps) * np.maximum(1.0, np.abs(x))
+        return (f(x + h) - f(x - h)) / (2 * h)
+    return df
+
+
+def newton(f, x0, df=None, tol=1e-12, max_iter=50, keep_trace=True):
+    """
+    Newton's method x <- x - f(x) / f'(x) from every starting point in x0.
+    f and df must work elementwise on arrays, real or complex. Without df
+    the derivative is taken by central differences. A lane converges when
+    f(x) is exactly 0 or its step is within tol relative to x. Only the
+    running lanes are evaluated each step.
+    """
+    derivative = df if df is not None else finite_difference(f)
+    # A step costs f and f' or, by differences, f three times
+    cost = 2 if df is not None else 3
+
+    def step(x):
+        fx = f(x)
+        return fx, fx / derivative(x)
+    return _iterate(f, x0, step, cost, tol, max_iter, keep_trace)
+
+
+def halley(f, x0, df, d2f, tol=1e-12, max_iter=50, keep_trace=True):
+    """
+    Halley's method x <- x - 2 f f' / (2 f'^2 - f f''), cubically convergent
+    at simple roots, from every starting point in x0. Converges like newton.
+    """
+    def step(x):
+        fx, dfx = f(x), df(x)
+        return fx, 2 * fx * dfx / (2 * dfx * dfx - fx * d2f(x))
+    return _iterate(f, x0, step, 3, tol, max_iter, keep_trace)
+
+
+def _iterate(f, x0, step, cost, tol, max_iter, keep_trace):
+    """
+    Loop of the one point methods. step(x) gives f(x) and the step to take
+    from x for the running lanes, a non-finite step fails the lane.
+    """
+    x0 = np.asarray(x0)
+    x = np.array(x0, dtype=complex if np.iscomplexobj(x0) else float).ravel()
+    lanes = _Lanes(x, keep_trace)
+    with np.errstate(all="ignore"):
+        for _ in range(max_iter):
+            if lanes.running.size == 0:
+                break
+            running = lanes.running
+            xr = x[running]
+            fr, dx = step(xr)
+            lanes.evaluations[running] += cost
+
+            root = fr == 0
+            move = ~root & np.isfinite(dx)
+            x[running[move]] = xr[move] - dx[move]
+            lanes.iterations[running[move]] += 1
+
+            done = root | (move & (np.abs(dx) <= tol * np.maximum(1.0, np.abs(xr))))
+            lanes.stop(done, ~(root | move))
+            lanes.record(x)
+        return lanes.result(f, x, x0.shape)
+
+
+def secant(f, x0, x1=None, tol=1e-12, max_iter=50, keep_trace=True):
+    """
+    Secant method from every starting point in x0, each with a second point
+    from x1 or a small step away. One evaluation of f per step, converging
+    with order 1.618 at simple roots.
+    """
+    x0 = np.asarray(x0, dtype=float)
+    a = x0.ravel().copy()
+    if x1 is None:
+        b = a + np.cbrt(np.finfo(float).eps) * np.maximum(1.0, np.abs(a))
+    else:
+        b = np.broadcast_to(np.asarray(x1, dtype=float), x0.shape).ravel().copy()
+    lanes = _Lanes(b, keep_trace)
+    with np.errstate(all="ignore"):
+        # Copies, f may hand back its argument and both get written in place
+        fa, fb = np.array(f(a), dtype=float), np.array(f(b), dtype=float)
+        lanes.evaluations += 2
+        for _ in range(max_iter):
+            if lanes.running.size == 0:
+                break
+            running = lanes.running
+            br, fbr = b[running], fb[running]
+            dx = fbr * (br - a[running]) / (fbr - fa[running])
+
+            root = fbr == 0
+            move = ~root & np.isfinite(dx)
+            moved = running[move]
+            a[moved], fa[moved] = br[move], fbr[move]
+            b[moved] = br[move] - dx[move]
+            fb[moved] = f(b[moved])
+            lanes.evaluations[moved] += 1
+            lanes.iterations[moved] += 1
+
+            done = root | (move & (np.abs(dx) <= tol * np.maximum(1.0, np.abs(br))))
+            lanes.stop(done, ~(root | move))
+            lanes.record(b)
+        return lanes.result(f, b, x0.shape)
+
+
+def bisection(f, a, b, tol=1e-12, max_iter=100, keep_trace=True):
+    """
+    Bisection of every bracket [a, b], halving it each step to the side
+    where f changes sign. The estimate is the midpoint, a lane converges
+    when the half width is within tol relative to it and fails when f has
+    the same sign at both ends.
+    """
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    shape = a.shape
+    lo, hi = a.ravel().copy(), b.ravel().copy()
+    mid = 0.5 * (lo + hi)
+    lanes = _Lanes(mid, keep_trace)
+    with np.errstate(all="ignore"):
+        # Copies, f may hand back its argument and both get written in place
+        flo, fhi = np.array(f(lo), dtype=float), np.array(f(hi), dtype=float)
+        lanes.evaluations += 2
+        lanes.stop(np.zeros(len(lo), dtype=bool), ~(np.sign(flo) * np.sign(fhi) <= 0))
+        for _ in range(max_iter):
+            if lanes.running.size == 0:
+                break
+            running = lanes.running
+            m = 0.5 * (lo[running] + hi[running])
+            fm = f(m)
+            lanes.evaluations[running] += 1
+            lanes.iterations[running] += 1
+
+            left = np.sign(fm) == np.sign(flo[running])
+            lo[running[left]], flo[running[left]] = m[left], fm[left]
+            hi[running[~left]] = m[~left]
+            mid[running] = np.where(fm == 0, m, 0.5 * (lo[running] + hi[running]))
+
+            done = (fm == 0) | (0.5 * (hi[running] - lo[running]) <= tol * np.maximum(1.0, np.abs(m)))
+            lanes.stop(done, ~np.isfinite(fm))
+            lanes.record(mid)
+        return lanes.result(f, mid, shape)
+
+
+def brent(f, a, b, tol=1e-12, max_iter=100, keep_trace=True):
+    """
+    Brent's method on every bracket [a, b]: inverse quadratic interpolation
+    or secant steps while they stay inside the bracket and shrink it fast
+    enough, bisection otherwise. As safe as bisection, usually as fast as
+    the secant method. Lanes whose f has the same sign at both ends fail.
+    """
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    shape = a.shape
+    a, b = a.ravel().copy(), b.ravel().copy()
+    lanes = _Lanes(b, keep_trace)
+    eps = np.finfo(float).eps
+    with np.errstate(all="ignore"):
+        fa, fb = np.array(f(a), dtype=float), np.array(f(b), dtype=float)
+        lanes.evaluations += 2
+        lanes.stop(np.zeros(len(a), dtype=bool), ~(np.sign(fa) * np.sign(fb) <= 0))
+        # c is the other end of the bracket around b, d the last step and e
+        # the one before it
+        c, fc = b.copy(), fb.copy()
+        d = b - a
+        e = d.copy()
+        for _ in range(max_iter):
+            if lanes.running.size == 0:
+                break
+            r = lanes.running
+            ar, br, cr, far, fbr, fcr, dr, er = a[r], b[r], c[r], fa[r], fb[r], fc[r], d[r], e[r]
+
+            # Keep the root between b and c
+            same = np.sign(fbr) * np.sign(fcr) > 0
+            cr, fcr = np.where(same, ar, cr), np.where(same, far, fcr)
+            dr, er = np.where(same, br - ar, dr), np.where(same, br - ar, er)
+            # Make b the best estimate
+            swap = np.abs(fcr) < np.abs(fbr)
+            ar, far = np.where(swap, br, ar), np.where(swap, fbr, far)
+            br, fbr = np.where(swap, cr, br), np.where(swap, fcr, fbr)
+            cr, fcr = np.where(swap, ar, cr), np.where(swap, far, fcr)
+
+            tol1 = 2 * eps * np.abs(br) + 0.5 * tol * np.maximum(1.0, np.abs(br))
+            xm = 0.5 * (cr - br)
+            done = (np.abs(xm) <= tol1) | (fbr == 0)
+
+            # Secant when a and c coincide, inverse quadratic otherwise
+            s = fbr / far
+            q, rr = far / fcr, fbr / fcr
+            secant_step = ar == cr
+            p = np.where(secant_step, 2 * xm * s, s * (2 * xm * q * (q - rr) - (br - ar) * (rr - 1)))
+            q = np.where(secant_step, 1 - s, (q - 1) * (rr - 1) * (s - 1))
+            q = np.where(p > 0, -q, q)
+            p = np.abs(p)
+            interpolate = (np.abs(er) >= tol1) & (np.abs(far) > np.abs(fbr))
+            accept = interpolate & (2 * p < np.minimum(3 * xm * q - np.abs(tol1 * q), np.abs(er * q)))
+            er = np.where(accept, dr, xm)
+            dr = np.where(accept, p / q, xm)
+
+            ar, far = br, fbr
+            step = np.where(np.abs(dr) > tol1, dr, np.where(xm >= 0, tol1, -tol1))
+            br = np.where(done, br, br + step)
+
+            a[r], b[r], c[r], fa[r], fb[r], fc[r], d[r], e[r] = ar, br, cr, far, fbr, fcr, dr, er
+            moved = r[~done]
+            fb[moved] = f(b[moved])
+            lanes.evaluations[moved] += 1
+            lanes.iterations[moved] += 1
+
+            lanes.stop(done, ~done & ~np.isfinite(fb[r]))
+            lanes.record(b)
+        return lanes.result(f, b, shape)
+
+
+def finite_difference_jacobian(F):
+    """
+    Central difference Jacobian of a batched F, (n, d) points to (n, m)
+    residuals. All 2 d shifted copies of the batch go through F in one call.
+    """
+    def jacobian(x):
+        n, d = x.shape
+        h = np.cbrt(np.finfo(float).eps) * np.maximum(1.0, np.abs(x))
+        shifts = np.eye(d)[:, None, :] * h[None]
+        values = F(np.concatenate([x[None] + shifts, x[None] - shifts]).reshape(2 * d * n, d))
+        values = values.reshape(2, d, n, -1)
+        # (d, n, m) columns to (n, m, d)
+        return np.moveaxis((values[0] - values[1]) / (2 * h.T[:, :, None]), 0, -1)
+    return jacobian
+
+
+def newton_system(F, x0, jacobian=None, tol=1e-12, max_iter=50, keep_trace=True):
+    """
+    Newton's method for systems from every row of x0, an (n, d) array of
+    starting points. F maps (k, d) points to (k, m) residuals and jacobian
+    them to (k, m, d) matrices, without it the Jacobian is taken by
+    differences. Square systems take Newton steps, over-determined ones
+    (m > d) Gauss-Newton steps, both as x <- x - pinv(J) F so singular
+    Jacobians give the least-norm step instead of an error. A lane converges
+    when F is exactly 0 or its step is within tol relative to x.
+    """
+    x = np.array(x0, dtype=float)
+    if x.ndim != 2:
+        raise ValueError(f"Starting points must be an (n, d) array, got shape {x.shape}")
+    derivative = jacobian if jacobian is not None else finite_difference_jacobian(F)
+    # A step costs F and J or, by differences, F 2 d + 1 times
+    cost = 2 if jacobian is not None else 2 * x.shape[1] + 1
+
+    lanes = _Lanes(x, keep_trace)
+    with np.errstate(all="ignore"):
+        for _ in range(max_iter):
+            if lanes.running.size == 0:
+                break
+            running = lanes.running
+            xr = x[running]
+            fr = F(xr)
+            jr = derivative(xr)
+            lanes.evaluations[running] += cost
+
+            root = np.all(fr == 0, axis=-1)
+            bad = ~root & ~(np.all(np.isfinite(fr), axis=-1) & np.all(np.isfinite(jr), axis=(-2, -1)))
+            move = ~(root | bad)
+            step = np.zeros_like(xr)
+            step[move] = np.einsum("kdm,km->kd", np.linalg.pinv(jr[move]), fr[move])
+            x[running[move]] = xr[move] - step[move]
+            lanes.iterations[running[move]] += 1
+
+            size = np.linalg.norm(step, axis=-1)
+            done = root | (move & (size <= tol * np.maximum(1.0, np.linalg.norm(xr, axis=-1))))
+            lanes.stop(done, bad)
+            lanes.record(x)
+        return lanes.result(F, x, (len(x),))
+
+
+def newton_basins(coefficients, center=0j, width=4.0, shape=(512, 512), max_iter=40, tol=1e-10,
+                  tile=128, workers=1):
+    """
+    Basins of attraction of Newton's method on a polynomial, for the pixel
+    centers of a window of the complex plane. The window is width wide
+    around center, with row 0 at the top. Returns the index into
+    np.roots(coefficients) each pixel converges to (-1 when it does not)
+    and the iterations it took, both of the given (rows, columns) shape.
+    The image is solved in square tiles, across a process pool when
+    workers > 1.
+    """
+    rows, columns = shape
+    coefficients = np.asarray(coefficients, dtype=complex)
+    roots = np.roots(coefficients)
+    pixel = width / columns
+    top_left = center + complex(-width / 2, rows * pixel / 2)
+
+    tiles = [
+        (coefficients, roots, top_left, pixel, r, min(r + tile, rows), c, min(c + tile, columns), max_iter, tol)
+        for r in range(0, rows, tile)
+        for c in range(0, columns, tile)
+    ]
+    basins = np.empty(shape, dtype=int)
+    iterations = np.empty(shape, dtype=int)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_basin_tile, tiles))
+    else:
+        results = [_basin_tile(args) for args in tiles]
+    for (_, _, _, _, r0, r1, c0, c1, _, _), (tile_basins, tile_iterations) in zip(tiles, results):
+        basins[r0:r1, c0:c1] = tile_basins
+        iterations[r0:r1, c0:c1] = tile_iterations
+    return basins, iterations
+
+
+def _basin_tile(args):
+    coefficients, roots, top_left, pixel, r0, r1, c0, c1, max_iter, tol = args
+    derivative = np.polyder(coefficients)
+    # Pixel centers, imaginary part decreasing down the rows
+    z = (top_left + pixel * (np.arange(c0, c1) + 0.5)[None, :]
+         - 1j * pixel * (np.arange(r0, r1) + 0.5)[:, None])
+    result = newton(
+        lambda x: np.polyval(coefficients, x), z, lambda x: np.polyval(derivative, x),
+        tol=tol, max_iter=max_iter, keep_trace=False,
+    )
+    distance = np.abs(result.x[..., None] - roots)
+    basins = np.argmin(distance, axis=-1)
+    # Call a lane part of a basin only if it converged onto that root
+    scale = np.maximum(1.0, np.abs(roots))
+    near = np.take_along_axis(distance, basins[..., None], axis=-1)[..., 0] <= 1e-6 * scale[basins]
+    basins[~(result.converged & near)] = -1
+    return basins, result.iterations
+
+
+class TestFunction():
+    """A benchmark function with its derivatives, its one real root and the interval starts are drawn from."""
+    def __init__(self, name, f, df, d2f, root, interval, label=None):
+        self.name = name
+        # TeX of the name, for scenes
+        self.label = label if label is not None else name
+        self.f = f
+        self.df = df
+        self.d2f = d2f
+        self.root = root
+        self.interval = interval
+
+    def __repr__(self):
+        return f"TestFunction({self.name})"
+
+
+CATALOGUE = {
+    "x^2 - 2": TestFunction(
+        "x^2 - 2", lambda x: x * x - 2, lambda x: 2 * x, lambda x: np.full_like(x, 2.0),
+        np.sqrt(2.0), (0.1, 4.0),
+    ),
+    "x^3 - 2x - 5": TestFunction(
+        "x^3 - 2x - 5", lambda x: x ** 3 - 2 * x - 5, lambda x: 3 * x * x - 2, lambda x: 6 * x,
+        2.0945514815423265, (-3.0, 5.0),
+    ),
+    # f' = -(1 + sin x) vanishes at x = -pi / 2 + 2 k pi, Newton stalls near those
+    "cos x - x": TestFunction(
+        "cos x - x", lambda x: np.cos(x) - x, lambda x: -np.sin(x) - 1, lambda x: -np.cos(x),
+        0.7390851332151607, (-4.0, 4.0), label=r"\cos x - x",
+    ),
+    "e^x - 2": TestFunction(
+        "e^x - 2", lambda x: np.exp(x) - 2, np.exp, np.exp,
+        np.log(2.0), (-2.0, 4.0),
+    ),
+    # Newton overshoots and diverges from |x0| > 1.3917
+    "atan x": TestFunction(
+        "atan x", np.arctan, lambda x: 1 / (1 + x * x), lambda x: -2 * x / (1 + x * x) ** 2,
+        0.0, (-3.0, 3.0), label=r"\arctan x",
+    ),
+    # Triple root, the open methods only converge linearly and Brent's
+    # interpolation shrinks the bracket by only about 2.5 every four steps,
+    # it takes 95 to 125 steps to reach 1e-12
+    "(x - 1)^3": TestFunction(
+        "(x - 1)^3", lambda x: (x - 1) ** 3, lambda x: 3 * (x - 1) ** 2, lambda x: 6 * (x - 1),
+        1.0, (-1.0, 3.0),
+    ),
+}
+
+METHODS = ("newton", "secant", "halley", "brent", "bisection")
+BRACKETING = ("brent", "bisection")
+
+
+def run_method(method, function, starts, tol=1e-12, max_iter=200, keep_trace=True):
+    """
+    Run one method of METHODS on a TestFunction. starts is an (n,) array of
+    starting points for the open methods and an (n, 2) array of brackets
+    for the bracketing ones.
+    """
+    f = function.f
+    if method == "newton":
+        return newton(f, starts, function.df, tol=tol, max_iter=max_iter, keep_trace=keep_trace)
+    if method == "secant":
+        return secant(f, starts, tol=tol, max_iter=max_iter, keep_trace=keep_trace)
+    if method == "halley":
+        return halley(f, starts, function.df, function.d2f, tol=tol, max_iter=max_iter, keep_trace=keep_trace)
+    if method == "brent":
+        return brent(f, starts[..., 0], starts[..., 1], tol=tol, max_iter=max_iter, keep_trace=keep_trace)
+    if method == "bisection":
+        return bisection(f, starts[..., 0], starts[..., 1], tol=tol, max_iter=max_iter, keep_trace=keep_trace)
+    raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+
+
+def benchmark_starts(function, n, seed=0):
+    """
+    n random starting points in the function's interval, and n brackets made
+    of one point drawn on each side of the root. Both come from the same
+    seed, so every method of a row starts from the same draw.
+    """
+    rng = np.random.default_rng(seed)
+    lo, hi = function.interval
+    points = rng.uniform(lo, hi, n)
+    brackets = np.stack([rng.uniform(lo, function.root, n), rng.uniform(function.root, hi, n)], axis=-1)
+    return points, brackets
+
+
+def benchmark(functions=tuple(CATALOGUE), methods=METHODS, num_starts=2000, tol=1e-12, max_iter=200, seed=0):
+    """
+    Run every method on every catalogue function from num_starts random
+    starts. Returns one row per (function, method) with the failure rate (not
+    converged, or converged somewhere other than the root), the mean and
+    median iterations and the mean evaluations of f and its derivatives
+    over the successful lanes, and the wall time per start in microseconds.
+    """
+    rows = []
+    for name in functions:
+        function = CATALOGUE[name]
+        points, brackets = benchmark_starts(function, num_starts, seed)
+        for method in methods:
+            starts = brackets if method in BRACKETING else points
+            t = time.perf_counter()
+            result = run_method(method, function, starts, tol, max_iter, keep_trace=False)
+            wall = (time.perf_counter() - t) / num_starts
+
+            # Loose on purpose, the triple root is only found to about cbrt(eps)
+            found = result.converged & (np.abs(result.x - function.root) <= 1e-4 * max(1.0, abs(function.root)))
+            rows.append({
+                "function": name,
+                "method": method,
+                "starts": num_starts,
+                "failure_rate": float(1 - found.mean()),
+                "iterations_mean": float(result.iterations[found].mean()) if found.any() else float("nan"),
+                "iterations_median": float(np.median(result.iterations[found])) if found.any() else float("nan"),
+                "evaluations_mean": float(result.evaluations[found].mean()) if found.any() else float("nan"),
+                "wall_us": wall * 1e6,
+            })
+    return rows
+
+
+def write_benchmark(rows, json_path=None, csv_path=None):
+    if json_path is not None:
+        with open(json_path, "w") as f:
+            json.dump({"results": rows}, f, indent=2)
+    if csv_path is not None:
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Newton, secant, Halley, Brent and bisection.")
+    parser.add_argument("--functions", nargs="+", default=list(CATALOGUE), choices=list(CATALOGUE))
+    parser.add_argument("--methods", nargs="+", default=list(METHODS), choices=METHODS)
+    parser.add_argument("--starts", type=int, default=2000, help="random starts per function")
+    parser.add_argument("--tol", type=float, default=1e-12)
+    parser.add_argument("--max-iter", type=int, default=200, help="iteration budget, the triple root needs over 100")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default="root_finding_benchmark.json")
+    parser.add_argument("--csv", default="root_finding_benchmark.csv")
+    args = parser.parse_args()
+
+    rows = benchmark(args.functions, args.methods, args.starts, args.tol, args.max_iter, args.seed)
+    write_benchmark(rows, args.json, args.csv)
+    for i, row in enumerate(rows):
+        print(f"{i:>3} {row['function']:>13} {row['method']:>9}: failed={row['failure_rate']:6.1%} "
+              f"iterations={row['iterations_mean']:5.1f} evaluations={row['evaluations_mean']:5.1f} "
+              f"wall={row['wall_us']:.2f}us")
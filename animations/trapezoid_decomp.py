@@ -1,419 +1,1121 @@
 from manimlib import *
 import numpy as np
 from collections import defaultdict, deque
+from fractions import Fraction
+import argparse
+import csv
+import functools
+import heapq
+import json
+import math
+import os
+import random
+import time
 
 manim_config.camera.background_color = "#CCCCCC"
 class CellBoundary():
-    def __init__(self, start, end_y):
+    def __init__(self, start, end_y, index=None):
+        self.index = index
         self.start = start
         self.end = np.array([start[0], end_y, 0])
         self.center = np.array([self.start[0], (self.start[1] + self.end[1])/2, 0])
 
-class TrapezoidDecomp(Scene):
-    def construct(self):
+class SweepEdge():
+    """Polygon edge stored with its lexicographically smaller endpoint first."""
+    def __init__(self, index, p, q):
+        self.index = index
+        p = (float(p[0]), float(p[1]))
+        q = (float(q[0]), float(q[1]))
+        self.left, self.right = (p, q) if p < q else (q, p)
+        self.vertical = self.left[0] == self.right[0]
+        # Whether free space lies directly above the edge, set when it enters L
+        self.free_above = None
+
+    def y_at(self, x, y):
+        # Point of the edge on the vertical line through (x, y). A vertical
+        # edge returns its endpoint closest to y.
+        if self.vertical:
+            return min(max(y, self.left[1]), self.right[1])
+        t = (x - self.left[0]) / (self.right[0] - self.left[0])
+        return self.left[1] + t * (self.right[1] - self.left[1])
+
+    def __repr__(self):
+        return f"SweepEdge({self.index}, {self.left}, {self.right})"
+
+
+class Cell():
+    """Trapezoid of free space between a bottom and a top edge."""
+    def __init__(self, bottom, top, x_left, left_boundaries):
+        self.bottom = bottom
+        self.top = top
+        self.x_left = x_left
+        self.x_right = None
+        self.left_boundaries = left_boundaries
+        self.right_boundaries = []
+
+    def close(self, x_right, right_boundaries):
+        self.x_right = x_right
+        self.right_boundaries = right_boundaries
+
+    def corners(self):
+        y = (self.bottom.left[1] + self.top.left[1]) / 2
+        return [
+            np.array([self.x_left, self.bottom.y_at(self.x_left, y), 0]),
+            np.array([self.x_right, self.bottom.y_at(self.x_right, y), 0]),
+            np.array([self.x_right, self.top.y_at(self.x_right, y), 0]),
+            np.array([self.x_left, self.top.y_at(self.x_left, y), 0]),
+        ]
+
+
+class SweepEvent():
+    """What happened when the sweep line reached one vertex."""
+    def __init__(self, kind, vertex, ended, started, boundaries, closed, opened):
+        self.kind = kind
+        self.vertex = vertex
+        self.ended = ended
+        self.started = started
+        self.boundaries = boundaries
+        self.closed = closed
+        self.opened = opened
+
+
+class TrapezoidDecomposition():
+    def __init__(self, edges, events, cells, boundaries, graph):
+        self.edges = edges
+        self.events = events
+        self.cells = cells
+        # Boundaries ordered by their index
+        self.boundaries = boundaries
+        # Boundary graph, cell_boundaries[b] lists the boundaries reachable
+        # from b through one cell. Boundaries of cells without a left
+        # boundary are listed under None.
+        self.graph = graph
+
+
+class TrapezoidSweep():
+    """
+    Trapezoidal decomposition of a polygon with holes. Vertices are popped
+    from a heap in (x, y) order and the edges crossing the sweep line are kept
+    in L, a balanced tree ordered bottom to top. Each vertex is classified
+    from its two edges and its neighbors in L:
+      BIRTH     both edges start and the vertex is outside free space
+      SPLIT     both edges start inside a cell, which is split in two
+      CONTINUE  one edge ends and the next starts
+      MERGE     both edges end and the cell between them closes
+      JOIN      both edges end inside free space, the cells around them join
+    so the whole decomposition takes O(n log n).
+    """
+    def __init__(self, outline, holes=()):
+        self.edges = []
+        self.vertices = []
+        self.incident = []
+        # First vertex and edge of each ring
+        self.ring_starts = []
+        self.num_boundaries = 0
+        for ring in [outline, *holes]:
+            first = len(self.vertices)
+            self.ring_starts.append(first)
+            for p in ring:
+                self.vertices.append((float(p[0]), float(p[1])))
+                self.incident.append([])
+            for i in range(len(ring)):
+                a = first + i
+                b = first + (i + 1) % len(ring)
+                if self.vertices[a] == self.vertices[b]:
+                    raise ValueError(f"Vertex {self.vertices[a]} is repeated, edges must have a length")
+                edge = SweepEdge(len(self.edges), self.vertices[a], self.vertices[b])
+                self.edges.append(edge)
+                self.incident[a].append(edge)
+                self.incident[b].append(edge)
+
+    def extensions(self):
         """
-        Example: Create multiple gray polygons and optional vertical dashed lines
-        to mimic 'background' shapes. Adjust coordinates and styling as needed.
+        Upward and downward extensions of every vertex as arrays, from a single
+        batched ray cast against all edges. See vertical_ray_hits.
         """
-        # from IPython import embed; embed()
-        edges = self._create_background()
-        line = self._create_sweep_line()
-        intersection_dot = self._create_dot()
-        cell_boundaries = defaultdict(list)
-        prev_cbs = [None]
+        segments = np.array([[e.left, e.right] for e in self.edges], dtype=float).reshape(-1, 2, 2)
+        return vertical_ray_hits(np.array(self.vertices, dtype=float), segments)
 
-        self.CUSTOM_BLUE = "#0000FF"
-        self.CUSTOM_GREEN = "#01FF00"
-        self.CUSTOM_RED = "#FF0000"
+    def decompose(self):
+        events = []
+        cells = []
+        boundaries = []
+        graph = defaultdict(list)
+        for event in self.events():
+            events.append(event)
+            boundaries.extend(b for b in event.boundaries if b.index == len(boundaries))
+            for cell in event.closed:
+                # Cells squeezed against a vertical edge have no width, they
+                # only carry the boundaries on their left over to their right
+                if cell.x_right > cell.x_left:
+                    cells.append(cell)
+                for b in cell.right_boundaries:
+                    for a in cell.left_boundaries or [None]:
+                        if a is not b and b not in graph[a]:
+                            graph[a].append(b)
+        return TrapezoidDecomposition(self.edges, events, cells, boundaries, graph)
 
-        # Blue edge messages
-        text = Text(
-            "Blue edges are part of free space segments in list L",
-            font="Arial", font_size=35,
-        )
-        text.set_color(BLACK)
-        text.set_color_by_text("Blue", self.CUSTOM_BLUE)
-        text.move_to(UP*3.3 + LEFT*2, aligned_edge=TOP)
-        self.play(Write(text))
-        
-        # Move the line
-        self._write_info(
-            "Move the line to the left most vertex",
-            {}
-        )
-        self.play(line.animate.move_to(self._convert_point_to_sweep_point(edges[0].start)), run_time= 1.0)
-        intersection_dot.move_to(edges[0].start)
-        self.play(FadeIn(intersection_dot), run_time= 1.0)
-        self._delete_info()
+    def events(self):
+        """Run the sweep, yielding a SweepEvent per vertex as it is processed."""
+        heap = [(x, y, i) for i, (x, y) in enumerate(self.vertices)]
+        yield from self._sweep(heap, _ActiveEdges(), {})
 
-        # Birth
-        self._write_info(
-            """
-            BIRTH: Two new edges are added to L and are associated with the source vertex
-            """,
-            {
-                "added": self.CUSTOM_GREEN,
-            },
-        )
-        self._add_edge_to_L(2.0, edges[0], edges[-5])
-        self._delete_info()
+    def _sweep(self, heap, active, open_cells):
+        # Process the vertices in heap starting from the edges in L and the
+        # open cells, keyed by their bottom edge, left of the first vertex
+        heapq.heapify(heap)
+        # Boundaries drawn on the current x, so vertices on the same vertical
+        # line share them instead of drawing overlapping ones
+        drawn = {}
+        prev = None
+        while heap:
+            x, y, i = heapq.heappop(heap)
+            v = (x, y)
+            if prev is None or prev[0] != x:
+                drawn = {}
+            ended = [e for e in self.incident[i] if e.right == v]
+            started = sorted(
+                (e for e in self.incident[i] if e.left == v),
+                key=functools.cmp_to_key(_compare_edges),
+            )
+            for e in ended:
+                active.remove(e)
+            below = active.below(v)
+            above = active.above(v)
+            in_free_space = below is not None and below.free_above
 
-        # Move the line to the next edge
-        self._write_info(
-            "Move the line to the next closest vertex in the x-direction",
-            {}
-        )
-        self._move_sweep_line(intersection_dot, line, edges[1].start)
-        self._delete_info()
+            boundaries = []
+            def extend(edge, up):
+                # Boundary from v up or down to the edge. There is none when a
+                # vertical edge at v already bounds the cells on that side.
+                if any(e.vertical and (e.left == v) == up for e in self.incident[i]):
+                    return None
+                end_y = edge.y_at(x, y)
+                # Stop at the closest vertex on the same vertical line
+                if up and heap and heap[0][0] == x:
+                    end_y = min(end_y, heap[0][1])
+                if not up and prev is not None and prev[0] == x:
+                    end_y = max(end_y, prev[1])
+                if end_y == y:
+                    return None
+                key = (min(y, end_y), max(y, end_y))
+                if key not in drawn:
+                    drawn[key] = CellBoundary(np.array([x, y, 0]), end_y, self.num_boundaries)
+                    self.num_boundaries += 1
+                if drawn[key] not in boundaries:
+                    boundaries.append(drawn[key])
+                return drawn[key]
 
-        # Continue
-        self._write_info(
-            """
-            CONTINUE: Draw the edge above and below the vertex until it hits an edge. 
-            Output the cells created by this edge and the cell boundaries above and below. 
-            Delete the edge that is ending from L.
-            Add the edge that is starting to L.
-            """,
-            {
-                "Delete": self.CUSTOM_RED,
-                "Add": self.CUSTOM_GREEN
-            }
-        )
-        self._remove_edge_from_L(2.0, edges[0])
-        self.wait(0.5)
-        self._add_edge_to_L(2.0, edges[1])
-        cb = CellBoundary(edges[1].start, edges[14].end[1])
-        cell_boundaries[prev_cbs[0]].append(cb)
-        prev_cbs = [cb]
-        self._draw_cell_boundary(cb)
-        self._delete_info()
+            def left_of(boundary, cell):
+                # Left boundaries of a cell opened next to a closed one
+                return [boundary] if boundary else list(cell.left_boundaries)
 
-        # Move the line to the next edge
-        self._move_sweep_line(intersection_dot, line, edges[2].start)
+            closed = []
+            opened = []
+            if not ended:
+                lo, hi = started
+                if in_free_space:
+                    kind = "SPLIT"
+                    cell = open_cells.pop(id(below))
+                    down, up = extend(below, False), extend(above, True)
+                    cell.close(x, [b for b in (down, up) if b])
+                    closed.append(cell)
+                    lo.free_above, hi.free_above = False, True
+                    opened.append(Cell(below, lo, x, left_of(down, cell)))
+                    opened.append(Cell(hi, above, x, left_of(up, cell)))
+                else:
+                    kind = "BIRTH"
+                    lo.free_above, hi.free_above = True, False
+                    opened.append(Cell(lo, hi, x, []))
+            elif not started:
+                if in_free_space:
+                    # Right end of an obstacle, the cells below and above it join
+                    kind = "JOIN"
+                    upper = next(e for e in ended if e.free_above)
+                    low_cell = open_cells.pop(id(below))
+                    high_cell = open_cells.pop(id(upper))
+                    down, up = extend(below, False), extend(above, True)
+                    low_cell.close(x, [down] if down else [])
+                    high_cell.close(x, [up] if up else [])
+                    closed.extend([low_cell, high_cell])
+                    left = left_of(down, low_cell)
+                    left += [b for b in left_of(up, high_cell) if b not in left]
+                    opened.append(Cell(below, above, x, left))
+                else:
+                    kind = "MERGE"
+                    lower = next(e for e in ended if e.free_above)
+                    cell = open_cells.pop(id(lower))
+                    cell.close(x, [])
+                    closed.append(cell)
+            else:
+                kind = "CONTINUE"
+                old, new = ended[0], started[0]
+                new.free_above = old.free_above
+                if old.free_above:
+                    cell = open_cells.pop(id(old))
+                    up = extend(above, True)
+                    cell.close(x, [up] if up else [])
+                    opened.append(Cell(new, cell.top, x, left_of(up, cell)))
+                else:
+                    cell = open_cells.pop(id(below))
+                    down = extend(below, False)
+                    cell.close(x, [down] if down else [])
+                    opened.append(Cell(below, new, x, left_of(down, cell)))
+                closed.append(cell)
 
-        # Continue
-        self._write_info(
-            """
-            CONTINUE
-            """,
-            {},
-        )
-        self._remove_edge_from_L(0.5, edges[1])
-        self.wait(0.5)
-        self._add_edge_to_L(0.5, edges[2])
-        cb = CellBoundary(edges[2].start, edges[14].end[1])
-        cell_boundaries[prev_cbs[0]].append(cb)
-        prev_cbs = [cb]
-        self._draw_cell_boundary(cb)
-        self._delete_info()
+            for e in started:
+                active.insert(e)
+            for cell in opened:
+                open_cells[id(cell.bottom)] = cell
+            prev = v
+            yield SweepEvent(kind, np.array([x, y, 0]), ended, started, boundaries, closed, opened)
 
-        # Move the line to the next edge
-        self._move_sweep_line(intersection_dot, line, edges[15].start)
 
-        # Split
-        self._write_info(
-            """
-            SPLIT: Draw the edge above and below the vertex until it hits an edge. 
-            Output the cells created by this edge and the cell boundaries above and below. 
-            No edges to delete. 
-            Add two edges that are starting to L.
-            """,
-            {
-                "delete": self.CUSTOM_RED,
-                "Add": self.CUSTOM_GREEN
-            }
-        )
-        self._add_edge_to_L(2.0, edges[15], edges[18])
-        end_y = (edges[2].start[1] + edges[2].end[1]) / 2
-        cb = CellBoundary(edges[15].start, end_y)
-        cb2 = CellBoundary(edges[15].start, edges[14].end[1])
-        cell_boundaries[prev_cbs[0]].append(cb)
-        cell_boundaries[prev_cbs[0]].append(cb2)
-        prev_cbs = [cb, cb2]
-        self._draw_cell_boundary(cb, cb2)
-        self._delete_info()
+def vertical_ray_hits(points, segments, chunk_size=1024):
+    """
+    Shoot vertical rays up and down from every point against every segment
+    at once. Returns the y where each upward and downward ray first hits a
+    segment and the index of that segment, with inf, -inf and -1 for rays
+    that hit nothing. Segments through the point itself, like the edges of a
+    vertex, and vertical segments are not hit.
 
-        # Move the line to the next edge
-        self._move_sweep_line(intersection_dot, line, edges[3].start)
+    Points are handled in chunks sorted by x and each chunk is only tested
+    against the segments overlapping its x-range, so memory stays at
+    chunk_size times the segments in range.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, np.shape(points)[-1])[:, :2]
+    segments = np.asarray(segments, dtype=float)[:, :, :2]
+    n = len(points)
+    up_y, up_edge = np.full(n, np.inf), np.full(n, -1)
+    down_y, down_edge = np.full(n, -np.inf), np.full(n, -1)
 
-        # Continue
-        self._write_info(
-            """
-            CONTINUE
-            """,
-            {},
-        )        
-        self._remove_edge_from_L(0.5, edges[2])
-        self.wait(0.5)
-        self._add_edge_to_L(0.5, edges[3])
-        cb = CellBoundary(edges[3].start, 0)
-        cell_boundaries[prev_cbs[0]].append(cb)
-        prev_cbs[0] = cb
-        self._draw_cell_boundary(cb)
-        self._delete_info()
+    # Segments left to right, without vertical ones, sorted by left x
+    swap = segments[:, 0, 0] > segments[:, 1, 0]
+    left = np.where(swap[:, None], segments[:, 1], segments[:, 0])
+    right = np.where(swap[:, None], segments[:, 0], segments[:, 1])
+    index = np.nonzero(right[:, 0] > left[:, 0])[0]
+    index = index[np.argsort(left[index, 0], kind="stable")]
+    x0, y0 = left[index, 0], left[index, 1]
+    x1, y1 = right[index, 0], right[index, 1]
+    slope = (y1 - y0) / (x1 - x0)
 
-        # Move the line to the next edge
-        self._move_sweep_line(intersection_dot, line, edges[16].start)
+    order = np.argsort(points[:, 0], kind="stable")
+    for a in range(0, n, chunk_size):
+        rows = order[a:a + chunk_size]
+        x, y = points[rows, 0:1], points[rows, 1:2]
+        end = np.searchsorted(x0, x[-1, 0], side="right")
+        candidates = np.nonzero(x1[:end] >= x[0, 0])[0]
+        if len(candidates) == 0:
+            continue
+        c0, c1 = x0[candidates], x1[candidates]
+        spans = (c0 <= x) & (x <= c1)
+        # Evaluate at the exact endpoint y when x is an endpoint, so the
+        # edges of a vertex never count as a hit
+        ys = y0[candidates] + (x - c0) * slope[candidates]
+        ys = np.where(x == c1, y1[candidates], ys)
+        ys = np.where(x == c0, y0[candidates], ys)
 
-        # Continue
-        self._write_info(
-            """
-            CONTINUE
-            """,
-            {},
-        )
-        self._remove_edge_from_L(0.5, edges[15])
-        self.wait(0.5)
-        self._add_edge_to_L(0.5, edges[16])
-        cb = CellBoundary(edges[16].start, edges[3].start[1])
-        cell_boundaries[prev_cbs[0]].append(cb)
-        prev_cbs[0] = cb
-        self._draw_cell_boundary(cb)
-        self._delete_info()
+        above = np.where(spans & (ys > y), ys, np.inf)
+        k = above.argmin(axis=1)
+        hit = above[np.arange(len(rows)), k]
+        up_y[rows] = hit
+        up_edge[rows] = np.where(np.isfinite(hit), index[candidates[k]], -1)
 
-        # Move the line to the next edge
-        self._move_sweep_line(intersection_dot, line, edges[18].start)
+        below = np.where(spans & (ys < y), ys, -np.inf)
+        k = below.argmax(axis=1)
+        hit = below[np.arange(len(rows)), k]
+        down_y[rows] = hit
+        down_edge[rows] = np.where(np.isfinite(hit), index[candidates[k]], -1)
+    return up_y, up_edge, down_y, down_edge
 
-        # Continue
-        self._write_info(
-            """
-            CONTINUE
-            """,
-            {},
-        )
-        self._remove_edge_from_L(0.5, edges[18])
-        self.wait(0.5)
-        self._add_edge_to_L(0.5, edges[17])
-        cb = CellBoundary(edges[18].start, edges[14].end[1])
-        cell_boundaries[prev_cbs[1]].append(cb)
-        prev_cbs[1] = cb
-        self._draw_cell_boundary(cb)
-        self._delete_info()
 
-        # Move the line to the next edge
-        self._move_sweep_line(intersection_dot, line, edges[17].start)
+class SlabIndex():
+    """
+    Point location over trapezoid cells. The plane is cut into vertical slabs
+    at every x where a cell starts or ends. No cell starts or ends inside a
+    slab, so the cells crossing it are ordered bottom to top and a point is
+    located by a binary search for its slab and then for the cell below it.
+    """
+    def __init__(self, cell_x, cell_bottom, cell_top):
+        self.cell_x = cell_x
+        self.cell_bottom = cell_bottom
+        self.cell_top = cell_top
+        # Bottom and top of each cell as lines y = slope * x + intercept
+        width = cell_x[:, 1] - cell_x[:, 0]
+        self.bottom_slope = (cell_bottom[:, 1] - cell_bottom[:, 0]) / width
+        self.bottom_intercept = cell_bottom[:, 0] - self.bottom_slope * cell_x[:, 0]
+        self.top_slope = (cell_top[:, 1] - cell_top[:, 0]) / width
+        self.top_intercept = cell_top[:, 0] - self.top_slope * cell_x[:, 0]
 
-        # Continue
-        self._write_info(
-            """
-            CONTINUE
-            """,
-            {},
-        )
-        self._remove_edge_from_L(0.5, edges[16], edges[17])
-        self.wait(0.5)
-        cb = CellBoundary(edges[17].start, edges[3].start[1])
-        cb2 = CellBoundary(edges[17].start, edges[14].end[1])
-        cell_boundaries[prev_cbs[0]].append(cb)
-        cell_boundaries[prev_cbs[1]].append(cb2)
-        prev_cbs = [cb, cb2]
-        self._draw_cell_boundary(cb, cb2)
-        self._delete_info()
+        self.xs = np.unique(cell_x)
+        first = np.searchsorted(self.xs, cell_x[:, 0])
+        last = np.searchsorted(self.xs, cell_x[:, 1])
+        # One entry per cell and slab it crosses, sorted by slab and then by
+        # the height of the cell in the middle of the slab
+        counts = last - first
+        cells = np.repeat(np.arange(len(cell_x)), counts)
+        slabs = first[cells] + np.arange(len(cells)) - (np.cumsum(counts) - counts)[cells]
+        middle = (self.xs[slabs] + self.xs[np.minimum(slabs + 1, len(self.xs) - 1)]) / 2
+        order = np.lexsort((self.bottom_slope[cells] * middle + self.bottom_intercept[cells], slabs))
+        self.slab_cells = cells[order]
+        self.slab_indptr = np.concatenate([[0], np.cumsum(np.bincount(slabs, minlength=max(len(self.xs) - 1, 0)))])
+        self.max_depth = int(np.ceil(np.log2(np.diff(self.slab_indptr).max(initial=0) + 1)))
 
-        # Move the line to the next edge
-        self._move_sweep_line(intersection_dot, line, edges[4].start)
+    def cell_corners(self, cell):
+        x_left, x_right = self.cell_x[cell]
+        return [
+            np.array([x_left, self.cell_bottom[cell, 0], 0]),
+            np.array([x_right, self.cell_bottom[cell, 1], 0]),
+            np.array([x_right, self.cell_top[cell, 1], 0]),
+            np.array([x_left, self.cell_top[cell, 0], 0]),
+        ]
 
-        # Continue
-        self._write_info(
-            """
-            CONTINUE
-            """,
-            {},
-        )
-        self._remove_edge_from_L(0.5, edges[3])
-        self.wait(0.5)
-        self._add_edge_to_L(0.5, edges[4])
-        cb = CellBoundary(edges[4].start, edges[14].start[1])
-        cell_boundaries[prev_cbs[0]].append(cb)
-        cell_boundaries[prev_cbs[1]].append(cb)
-        prev_cbs = [cb]
-        self._draw_cell_boundary(cb)
-        self._delete_info()
+    def locate(self, points):
+        """Index of the cell containing each point, -1 if it is outside every cell."""
+        points = np.asarray(points, dtype=float).reshape(-1, np.shape(points)[-1])
+        x, y = points[:, 0], points[:, 1]
+        if len(self.xs) < 2:
+            return np.full(len(points), -1)
+        slab = np.clip(np.searchsorted(self.xs, x, side="right") - 1, 0, len(self.xs) - 2)
+        first = self.slab_indptr[slab]
+        lo, hi = first, self.slab_indptr[slab + 1]
+        # Find the first cell whose bottom is above the point, all at once
+        for _ in range(self.max_depth):
+            searching = lo < hi
+            mid = np.minimum((lo + hi) // 2, len(self.slab_cells) - 1)
+            c = self.slab_cells[mid]
+            below = self.bottom_slope[c] * x + self.bottom_intercept[c] <= y
+            lo = np.where(searching & below, mid + 1, lo)
+            hi = np.where(searching & ~below, mid, hi)
+        c = self.slab_cells[np.maximum(lo - 1, 0)]
+        found = (lo > first) & (y <= self.top_slope[c] * x + self.top_intercept[c])
+        found &= (x >= self.xs[0]) & (x <= self.xs[-1])
+        return np.where(found, c, -1)
 
-        # Move the line to the next edge
-        self._move_sweep_line(intersection_dot, line, edges[14].start)
+    def trace(self, point):
+        """The slab of a point, the cells probed by the search and the cell found."""
+        x, y = float(point[0]), float(point[1])
+        if len(self.xs) < 2 or not self.xs[0] <= x <= self.xs[-1]:
+            return None, [], -1
+        slab = min(max(int(np.searchsorted(self.xs, x, side="right")) - 1, 0), len(self.xs) - 2)
+        first = lo = int(self.slab_indptr[slab])
+        hi = int(self.slab_indptr[slab + 1])
+        probes = []
+        while lo < hi:
+            mid = (lo + hi) // 2
+            c = int(self.slab_cells[mid])
+            probes.append(c)
+            if self.bottom_slope[c] * x + self.bottom_intercept[c] <= y:
+                lo = mid + 1
+            else:
+                hi = mid
+        c = int(self.slab_cells[lo - 1]) if lo > first else -1
+        if c >= 0 and y > self.top_slope[c] * x + self.top_intercept[c]:
+            c = -1
+        return slab, probes, c
 
-        # Continue
-        self._write_info(
-            """
-            CONTINUE: There are multiple vertices at this x-coordinate. This vertex, with
-            the lowest y-coordinate is processed first.
-            """,
-            {
-                "Delete": self.CUSTOM_RED,
-                "Add": self.CUSTOM_GREEN
-            }
-        )
-        self._remove_edge_from_L(2.0, edges[14])
-        self.wait(1.0)
-        self._add_edge_to_L(2.0, edges[13])
-        cb = CellBoundary(edges[14].start, edges[11].start[1])
-        cell_boundaries[prev_cbs[0]].append(cb)
-        prev_cbs = [prev_cbs[0], cb]
-        self._draw_cell_boundary(cb)
-        self._delete_info()
 
-        # Move the line to the next edge
-        self._move_sweep_line(intersection_dot, line, edges[11].start)
+class Roadmap():
+    """
+    Boundary graph of a decomposition for path planning. Nodes are the
+    midpoints of the cell boundaries and any two boundaries of the same cell
+    are linked, weighted by the distance between their midpoints. Neighbors
+    are stored in CSR form: the neighbors of node u are
+    indices[indptr[u]:indptr[u + 1]] with the matching weights.
+    """
+    def __init__(self, decomposition):
+        self.points = np.array([b.center[:2] for b in decomposition.boundaries], dtype=float).reshape(-1, 2)
+        n = len(self.points)
 
-        # Split
-        self._write_info(
-            """
-            SPLIT
-            """,
-            {},
-        )
-        self._add_edge_to_L(0.5, edges[10], edges[11])
-        self._delete_info()
+        # Trapezoid of each cell, corners as x_left, x_right and the bottom
+        # and top y at both sides
+        cells = decomposition.cells
+        corners = np.array([[c[:2] for c in cell.corners()] for cell in cells], dtype=float).reshape(-1, 4, 2)
+        self.cell_x = corners[:, [0, 1], 0]
+        self.cell_bottom = corners[:, [0, 1], 1]
+        self.cell_top = corners[:, [3, 2], 1]
+        self.cell_index = SlabIndex(self.cell_x, self.cell_bottom, self.cell_top)
+        # Boundaries of each cell, also in CSR form
+        # Node of each boundary, boundary indices can have gaps after updates
+        node = {b.index: i for i, b in enumerate(decomposition.boundaries)}
+        cell_nodes = [sorted({node[b.index] for b in cell.left_boundaries + cell.right_boundaries}) for cell in cells]
+        self.cell_indptr = np.cumsum([0] + [len(nodes) for nodes in cell_nodes])
+        self.cell_nodes = np.array([u for nodes in cell_nodes for u in nodes], dtype=np.int64)
 
-        # Move the line to the next edge
-        self._move_sweep_line(intersection_dot, line, edges[10].start)
+        pairs = [(u, v) for nodes in cell_nodes for i, u in enumerate(nodes) for v in nodes[i + 1:]]
+        # Links through zero-width cells along vertical edges are only in the graph
+        pairs += [(node[a.index], node[b.index]) for a, bs in decomposition.graph.items() if a is not None for b in bs]
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        src = np.concatenate([pairs[:, 0], pairs[:, 1]])
+        dst = np.concatenate([pairs[:, 1], pairs[:, 0]])
+        keys = np.unique(src * n + dst)
+        src, dst = keys // n, keys % n
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(src, minlength=n))])
+        self.indices = dst
+        self.weights = np.hypot(*(self.points[dst] - self.points[src]).T)
 
-        # Continue
-        self._write_info(
-            """
-            CONTINUE
-            """,
-            {},
-        )
-        self._remove_edge_from_L(0.5, edges[10])
-        self.wait(0.5)
-        self._add_edge_to_L(0.5, edges[9])
-        end_y = (edges[4].start[1] + edges[4].end[1]) / 2
-        cb = CellBoundary(edges[10].start, end_y)
-        cell_boundaries[prev_cbs[0]].append(cb)
-        prev_cbs[0] = cb
-        self._draw_cell_boundary(cb)
-        self._delete_info()
+        # Plain lists are much faster than array indexing in the search loop
+        self._xy = self.points.tolist()
+        self._neighbors = [
+            list(zip(self.indices[a:b].tolist(), self.weights[a:b].tolist()))
+            for a, b in zip(self.indptr[:-1], self.indptr[1:])
+        ]
 
-        # Move the line to the next edge
-        self._move_sweep_line(intersection_dot, line, edges[12].start)
+    @property
+    def num_nodes(self):
+        return len(self.points)
 
-        # Continue
-        self._write_info(
-            """
-            CONTINUE
-            """,
-            {},
-        )
-        self._remove_edge_from_L(0.5, edges[11])
-        self.wait(0.5)
-        self._add_edge_to_L(0.5, edges[12])
-        end_y = (edges[13].start[1] + edges[13].end[1]) / 2
-        cb = CellBoundary(edges[12].start, end_y)
-        cell_boundaries[prev_cbs[1]].append(cb)
-        prev_cbs[1] = cb
-        self._draw_cell_boundary(cb)
-        self._delete_info()
+    def edges(self):
+        """Each undirected edge once, as (u, v) index pairs with u < v."""
+        src = np.repeat(np.arange(self.num_nodes), np.diff(self.indptr))
+        keep = src < self.indices
+        return np.stack([src[keep], self.indices[keep]], axis=1)
 
-        # Move the line to the next edge
-        self._move_sweep_line(intersection_dot, line, edges[5].start)
+    def locate(self, points):
+        """Index of the cell containing each point, -1 if it is outside free space."""
+        return self.cell_index.locate(points)
 
-        # Continue
-        self._write_info(
-            """
-            CONTINUE
-            """,
-            {},
-        )
-        self._remove_edge_from_L(0.5, edges[4])
-        self.wait(0.5)
-        self._add_edge_to_L(0.5, edges[5])
-        cb = CellBoundary(edges[5].start, edges[9].end[1])
-        cell_boundaries[prev_cbs[0]].append(cb)
-        prev_cbs[0] = cb
-        self._draw_cell_boundary(cb)
-        self._delete_info()
+    def shortest_path(self, start, goal, heuristic=True):
+        """
+        Shortest path from start to goal through the boundary midpoints, by A*
+        with the straight line distance to the goal as heuristic, or Dijkstra
+        with heuristic=False. Returns the path as an (n, 2) array of points
+        and its length, or None if either point is outside free space or the
+        goal cannot be reached.
+        """
+        start = tuple(float(c) for c in start[:2])
+        goal = tuple(float(c) for c in goal[:2])
+        # The scalar search has none of the array overhead of locate()
+        start_cell = self.cell_index.trace(start)[2]
+        goal_cell = self.cell_index.trace(goal)[2]
+        if start_cell < 0 or goal_cell < 0:
+            return None
+        if start_cell == goal_cell:
+            return np.array([start, goal]), math.dist(start, goal)
 
-        # Move the line to the next edge
-        self._move_sweep_line(intersection_dot, line, edges[13].start)
+        xy = self._xy
+        neighbors = self._neighbors
+        to_goal = math.dist if heuristic else (lambda p, q: 0.0)
+        # Nodes leading to the goal, with the cost of the last step
+        exits = {u: math.dist(xy[u], goal) for u in self._cell_nodes(goal_cell)}
 
-        # Merge
-        self._write_info(
+        # Start and goal are virtual nodes -1 and -2
+        dist = {}
+        prev = {}
+        heap = []
+        for u in self._cell_nodes(start_cell):
+            d = math.dist(start, xy[u])
+            dist[u] = d
+            prev[u] = -1
+            heap.append((d + to_goal(xy[u], goal), d, u))
+        heapq.heapify(heap)
+        while heap:
+            _, d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            if u == -2:
+                break
+            if u in exits and d + exits[u] < dist.get(-2, math.inf):
+                dist[-2] = d + exits[u]
+                prev[-2] = u
+                heapq.heappush(heap, (dist[-2], dist[-2], -2))
+            for v, w in neighbors[u]:
+                w += d
+                if w < dist.get(v, math.inf):
+                    dist[v] = w
+                    prev[v] = u
+                    heapq.heappush(heap, (w + to_goal(xy[v], goal), w, v))
+        if -2 not in dist:
+            return None
+
+        path = [goal]
+        u = prev[-2]
+        while u != -1:
+            path.append(xy[u])
+            u = prev[u]
+        path.append(start)
+        return np.array(path[::-1]), dist[-2]
+
+    def _cell_nodes(self, cell):
+        return self.cell_nodes[self.cell_indptr[cell]:self.cell_indptr[cell + 1]].tolist()
+
+
+class IncrementalDecomposition():
+    """
+    Decomposition of a map whose obstacles move. Moving an obstacle only
+    re-sweeps the x-interval between the closest vertices left and right of
+    its old and new position. The cells crossing the ends of the interval are
+    reopened before and merged back after the partial sweep, so the result is
+    the same as decomposing the new map from scratch.
+    """
+    def __init__(self, outline, holes=()):
+        self.sweep = TrapezoidSweep(outline, holes)
+        # Every closed cell, including the zero-width ones along vertical edges
+        self._cells = {}
+        self._boundaries = {}
+        # Graph links with the number of cells contributing each
+        self._links = defaultdict(int)
+        self.graph = defaultdict(list)
+        for event in self.sweep.events():
+            for cell in event.closed:
+                self._add_cell(cell)
+        self._xy = np.array(self.sweep.vertices, dtype=float).reshape(-1, 2)
+
+    @property
+    def cells(self):
+        return [cell for cell in self._cells.values() if cell.x_right > cell.x_left]
+
+    @property
+    def boundaries(self):
+        return [self._boundaries[i] for i in sorted(self._boundaries)]
+
+    def roadmap(self):
+        return Roadmap(self)
+
+    def move_obstacle(self, k, ring):
+        """
+        Replace obstacle k (the k-th hole) by the ring, which must have the same
+        number of vertices. Returns the cells removed and added.
+        """
+        ring = np.asarray(ring, dtype=float)[:, :2]
+        r = k + 1
+        first = self.sweep.ring_starts[r]
+        stop = self.sweep.ring_starts[r + 1] if r + 1 < len(self.sweep.ring_starts) else len(self._xy)
+        if len(ring) != stop - first:
+            raise ValueError(f"Obstacle {k} has {stop - first} vertices, got {len(ring)}")
+
+        lo = min(self._xy[first:stop, 0].min(), ring[:, 0].min())
+        hi = max(self._xy[first:stop, 0].max(), ring[:, 0].max())
+        others = np.delete(self._xy[:, 0], np.arange(first, stop))
+        if not (others < lo).any() or not (others > hi).any():
+            raise ValueError(f"Obstacle {k} must stay inside the outline")
+        # Sweep between the closest vertices outside the moved range, where
+        # no vertex lies on the ends of the interval
+        x_start = (others[others < lo].max() + lo) / 2
+        x_stop = (others[others > hi].min() + hi) / 2
+
+        removed = [c for c in self._cells.values() if c.x_left < x_stop and c.x_right > x_start]
+        for cell in removed:
+            self._remove_cell(cell)
+        for i in [i for i, b in self._boundaries.items() if x_start < b.start[0] < x_stop]:
+            del self._boundaries[i]
+
+        self._set_ring(r, ring)
+
+        # Reopen the cells crossing the start of the interval, their edges
+        # are the edges crossing the sweep line there
+        active = _ActiveEdges()
+        open_cells = {}
+        for cell in removed:
+            if cell.x_left < x_start:
+                cell.close(None, [])
+                active.insert(cell.bottom)
+                active.insert(cell.top)
+                open_cells[id(cell.bottom)] = cell
+        inside = np.nonzero((self._xy[:, 0] > x_start) & (self._xy[:, 0] < x_stop))[0]
+        heap = list(zip(self._xy[inside, 0].tolist(), self._xy[inside, 1].tolist(), inside.tolist()))
+
+        added = []
+        for event in self.sweep._sweep(heap, active, open_cells):
+            added.extend(event.closed)
+        # Cells still open at the end of the interval continue as the cells
+        # that crossed it, which have the same bottom and top edges
+        for cell in removed:
+            if cell.x_right > x_stop:
+                reopened = open_cells.pop(id(cell.bottom))
+                reopened.close(cell.x_right, cell.right_boundaries)
+                added.append(reopened)
+        for cell in added:
+            self._add_cell(cell)
+        return removed, added
+
+    def _set_ring(self, r, ring):
+        first = self.sweep.ring_starts[r]
+        n = len(ring)
+        for i in range(n):
+            self.sweep.vertices[first + i] = (float(ring[i, 0]), float(ring[i, 1]))
+            self.sweep.incident[first + i] = []
+        for i in range(n):
+            a = first + i
+            b = first + (i + 1) % n
+            edge = SweepEdge(a, self.sweep.vertices[a], self.sweep.vertices[b])
+            self.sweep.edges[a] = edge
+            self.sweep.incident[a].append(edge)
+            self.sweep.incident[b].append(edge)
+        self._xy[first:first + n] = ring
+
+    def _add_cell(self, cell):
+        self._cells[id(cell)] = cell
+        for b in cell.left_boundaries + cell.right_boundaries:
+            self._boundaries[b.index] = b
+        for b in cell.right_boundaries:
+            for a in cell.left_boundaries or [None]:
+                if a is not b:
+                    self._links[a, b] += 1
+                    if self._links[a, b] == 1:
+                        self.graph[a].append(b)
+
+    def _remove_cell(self, cell):
+        del self._cells[id(cell)]
+        for b in cell.right_boundaries:
+            for a in cell.left_boundaries or [None]:
+                if a is not b:
+                    self._links[a, b] -= 1
+                    if self._links[a, b] == 0:
+                        del self._links[a, b]
+                        self.graph[a].remove(b)
+
+
+def floor_plan(columns, rows, seed=0):
+    """Outline with a ragged top and bottom around a grid of random obstacles."""
+    rng = np.random.default_rng(seed)
+    xs = np.linspace(0, columns, 4 * columns + 1)[1:-1]
+    outline = np.concatenate([
+        [[-0.2, -0.3]],
+        np.column_stack([xs, rng.uniform(-0.3, -0.1, len(xs))]),
+        [[columns + 0.2, -0.3], [columns + 0.2, rows + 0.3]],
+        np.column_stack([xs[::-1], rows + rng.uniform(0.1, 0.3, len(xs))]),
+        [[-0.2, rows + 0.3]],
+    ])
+    holes = []
+    for i in range(columns):
+        for j in range(rows):
+            angles = np.linspace(0, 2 * np.pi, 7, endpoint=False) + rng.uniform(0, 2 * np.pi)
+            radii = rng.uniform(0.2, 0.35, len(angles))
+            holes.append(np.column_stack([i + 0.5 + radii * np.cos(angles), j + 0.5 + radii * np.sin(angles)]))
+    return outline, holes
+
+
+def benchmark_incremental(sizes, moves=20, seed=0):
+    """
+    Time moving one obstacle of n by n floor plans, updating incrementally
+    against decomposing the moved map from scratch.
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for n in sizes:
+        outline, holes = floor_plan(n, n, seed)
+        decomposition = IncrementalDecomposition(outline, holes)
+        incremental = full = 0.0
+        for _ in range(moves):
+            k = int(rng.integers(len(holes)))
+            holes[k] = holes[k] + rng.uniform(-0.1, 0.1, 2)
+            start = time.perf_counter()
+            decomposition.move_obstacle(k, holes[k])
+            incremental += time.perf_counter() - start
+            start = time.perf_counter()
+            TrapezoidSweep(outline, holes).decompose()
+            full += time.perf_counter() - start
+        rows.append({
+            "n": n,
+            "vertices": len(decomposition.sweep.vertices),
+            "incremental_ms": 1000 * incremental / moves,
+            "full_ms": 1000 * full / moves,
+            "speedup": full / incremental,
+        })
+    return rows
+
+
+def load_environment(path):
+    """
+    Load a polygon with holes as (outline, holes), each ring an (n, 2) array.
+    JSON files hold a GeoJSON Polygon, Feature or FeatureCollection. The first
+    ring of the first polygon is the outline, its other rings and every other
+    polygon are obstacles. .npz files hold a float array "vertices" of shape
+    (n, 2) and an int array "ring_starts" with the first vertex of each ring.
+    """
+    if os.path.splitext(path)[1] == ".npz":
+        with np.load(path) as data:
+            vertices = np.asarray(data["vertices"], dtype=float)
+            starts = list(data["ring_starts"]) + [len(vertices)]
+        rings = [vertices[a:b] for a, b in zip(starts, starts[1:])]
+        rings = [r[~np.all(r == np.roll(r, 1, axis=0), axis=1)] if len(r) > 1 else r for r in rings]
+        return rings[0], rings[1:]
+
+    with open(path) as f:
+        data = json.load(f)
+    polygons = []
+    def collect(geometry):
+        if geometry["type"] == "Polygon":
+            polygons.append(geometry["coordinates"])
+        elif geometry["type"] == "MultiPolygon":
+            polygons.extend(geometry["coordinates"])
+        elif geometry["type"] == "Feature":
+            collect(geometry["geometry"])
+        elif geometry["type"] == "FeatureCollection":
+            for feature in geometry["features"]:
+                collect(feature)
+        else:
+            raise ValueError(f"Unsupported geometry type {geometry['type']}")
+    collect(data)
+    if not polygons:
+        raise ValueError(f"{path} has no polygons")
+
+    def ring(coordinates):
+        points = np.array(coordinates, dtype=float)[:, :2]
+        # GeoJSON rings repeat their first vertex at the end, and drawn
+        # maps often repeat vertices too
+        repeated = np.all(points == np.roll(points, 1, axis=0), axis=1)
+        return points[~repeated] if len(points) > 1 else points
+    outline = ring(polygons[0][0])
+    holes = [ring(r) for r in polygons[0][1:]]
+    holes += [ring(r) for polygon in polygons[1:] for r in polygon[:1]]
+    return outline, holes
+
+
+def save_environment(path, outline, holes=()):
+    rings = [np.asarray(r, dtype=float)[:, :2] for r in [outline, *holes]]
+    if os.path.splitext(path)[1] == ".npz":
+        starts = np.cumsum([0] + [len(r) for r in rings[:-1]])
+        np.savez(path, vertices=np.concatenate(rings), ring_starts=starts)
+        return
+    coordinates = [r.tolist() + r[:1].tolist() for r in rings]
+    with open(path, "w") as f:
+        json.dump({"type": "Polygon", "coordinates": coordinates}, f)
+
+
+def decompose_to_disk(outline, holes, out_dir):
+    """
+    Decompose without keeping the decomposition in memory. Cells, boundaries
+    and roadmap edges are written to CSV files in out_dir as the sweep closes
+    them, so only the cells crossing the sweep line are held at any time.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    counts = {"vertices": 0, "cells": 0, "boundaries": 0, "roadmap_edges": 0}
+    with open(os.path.join(out_dir, "cells.csv"), "w", newline="") as cells_file, \
+            open(os.path.join(out_dir, "boundaries.csv"), "w", newline="") as boundaries_file, \
+            open(os.path.join(out_dir, "roadmap.csv"), "w", newline="") as roadmap_file:
+        cells = csv.writer(cells_file)
+        boundaries = csv.writer(boundaries_file)
+        roadmap = csv.writer(roadmap_file)
+        cells.writerow(["cell", "x_left", "x_right", "bottom_left_y", "bottom_right_y", "top_left_y", "top_right_y"])
+        boundaries.writerow(["boundary", "x", "y_start", "y_end"])
+        roadmap.writerow(["cell", "from_boundary", "to_boundary"])
+
+        for event in TrapezoidSweep(outline, holes).events():
+            counts["vertices"] += 1
+            for b in event.boundaries:
+                # Boundaries shared by vertices on the same x are reported again
+                if b.index == counts["boundaries"]:
+                    boundaries.writerow([b.index, b.start[0], b.start[1], b.end[1]])
+                    counts["boundaries"] += 1
+            for cell in event.closed:
+                if cell.x_right > cell.x_left:
+                    bl, br, tr, tl = cell.corners()
+                    cells.writerow([counts["cells"], cell.x_left, cell.x_right, bl[1], br[1], tl[1], tr[1]])
+                    cell_id = counts["cells"]
+                    counts["cells"] += 1
+                else:
+                    # Links through a zero-width cell along a vertical edge
+                    cell_id = -1
+                for b in cell.right_boundaries:
+                    for a in cell.left_boundaries:
+                        if a is not b:
+                            roadmap.writerow([cell_id, a.index, b.index])
+                            counts["roadmap_edges"] += 1
+    return counts
+
+
+# Relative error bound of the floating point orientation test (Shewchuk's
+# ccwerrboundA). A determinant above it has the right sign.
+_ORIENT_ERROR = (3.0 + 16.0 * 2.0 ** -53) * 2.0 ** -53
+
+
+def _orient(a, b, c):
+    # Twice the signed area of the triangle abc, positive if c is left of ab.
+    # The sign is exact: when the floating point result is within its error
+    # bound, which happens only for nearly collinear points, it is recomputed
+    # with rationals.
+    left = (b[0] - a[0]) * (c[1] - a[1])
+    right = (b[1] - a[1]) * (c[0] - a[0])
+    det = left - right
+    if abs(det) > _ORIENT_ERROR * (abs(left) + abs(right)):
+        return det
+    return _orient_exact(a, b, c)
+
+
+def _orient_exact(a, b, c):
+    ax, ay, bx, by, cx, cy = (Fraction(v) for v in (*a[:2], *b[:2], *c[:2]))
+    det = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    return (det > 0) - (det < 0)
+
+
+def _side(edge, p):
+    # +1 if p is above the edge on the sweep line, -1 if below, 0 if on it.
+    # A vertical edge counts as tilted slightly to the right, so points left
+    # of it or past its upper end are above it.
+    o = _orient(edge.left, edge.right, p)
+    if o == 0 and edge.vertical:
+        return (p[1] > edge.right[1]) - (p[1] < edge.left[1])
+    return (o > 0) - (o < 0)
+
+
+def _compare_edges(a, b):
+    # Order of two edges in L that do not cross, negative if a is below b.
+    # The edge that starts later is located against the other one.
+    if a is b:
+        return 0
+    if a.left >= b.left:
+        return _side(b, a.left) or _side(b, a.right)
+    return -(_side(a, b.left) or _side(a, b.right))
+
+
+class _TreapNode():
+    __slots__ = ("edge", "priority", "left", "right")
+
+    def __init__(self, edge, priority):
+        self.edge = edge
+        self.priority = priority
+        self.left = None
+        self.right = None
+
+
+class _ActiveEdges():
+    """The list L of edges crossing the sweep line, a treap ordered bottom to top."""
+    def __init__(self, seed=0):
+        self.root = None
+        self.size = 0
+        self.random = random.Random(seed)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        stack = []
+        node = self.root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.edge
+            node = node.right
+
+    def insert(self, edge):
+        lower, upper = self._split(self.root, lambda e: _compare_edges(e, edge) < 0)
+        node = _TreapNode(edge, self.random.random())
+        self.root = self._merge(self._merge(lower, node), upper)
+        self.size += 1
+
+    def remove(self, edge):
+        lower, upper = self._split(self.root, lambda e: _compare_edges(e, edge) < 0)
+        first, upper = self._pop_first(upper)
+        if first is not edge:
+            raise ValueError(f"{edge} is not in L")
+        self.root = self._merge(lower, upper)
+        self.size -= 1
+
+    def below(self, p):
+        """Highest edge below the point p."""
+        found = None
+        node = self.root
+        while node:
+            if _side(node.edge, p) > 0:
+                found = node.edge
+                node = node.right
+            else:
+                node = node.left
+        return found
+
+    def above(self, p):
+        """Lowest edge above the point p."""
+        found = None
+        node = self.root
+        while node:
+            if _side(node.edge, p) < 0:
+                found = node.edge
+                node = node.left
+            else:
+                node = node.right
+        return found
+
+    def _split(self, node, is_lower):
+        # Split into the prefix of edges where is_lower holds and the rest
+        if node is None:
+            return None, None
+        if is_lower(node.edge):
+            node.right, upper = self._split(node.right, is_lower)
+            return node, upper
+        lower, node.left = self._split(node.left, is_lower)
+        return lower, node
+
+    def _merge(self, lower, upper):
+        if lower is None:
+            return upper
+        if upper is None:
+            return lower
+        if lower.priority > upper.priority:
+            lower.right = self._merge(lower.right, upper)
+            return lower
+        upper.left = self._merge(lower, upper.left)
+        return upper
+
+    def _pop_first(self, node):
+        if node is None:
+            return None, None
+        if node.left is None:
+            return node.edge, node.right
+        first, node.left = self._pop_first(node.left)
+        return first, node
+
+
+class TrapezoidDecomp(Scene):
+    # Map file to decompose instead of the built-in map, see load_environment
+    ENVIRONMENT = None
+    # Path planned over the boundary graph
+    PLAN_START = np.array([-5.5, -1.5, 0])
+    PLAN_GOAL = np.array([1.5, 1.5, 0])
+    # Draw lines sharing a style as one mobject and animate them in a few
+    # plays instead of one play per event and edge, for large maps
+    BATCHED = False
+
+    # Explanation shown the first time each kind of event is processed
+    EVENT_INFO = {
+        "BIRTH": (
+            """
+            BIRTH: Two new edges are added to L and are associated with the source vertex
+            """,
+            {"added": "#01FF00"},
+        ),
+        "CONTINUE": (
+            """
+            CONTINUE: Draw the edge above and below the vertex until it hits an edge.
+            Output the cells created by this edge and the cell boundaries above and below.
+            Delete the edge that is ending from L.
+            Add the edge that is starting to L.
+            """,
+            {"Delete": "#FF0000", "Add": "#01FF00"},
+        ),
+        "SPLIT": (
+            """
+            SPLIT: Draw the edge above and below the vertex until it hits an edge.
+            Output the cells created by this edge and the cell boundaries above and below.
+            No edges to delete.
+            Add two edges that are starting to L.
+            """,
+            {"delete": "#FF0000", "Add": "#01FF00"},
+        ),
+        "MERGE": (
             """
             MERGE: Output the cell bounded below and above by the ended edges.
             Delete the edges from L.
             """,
-            {
-                "Delete": self.CUSTOM_RED,
-            }
-        )
-        self._remove_edge_from_L(2.0, edges[12], edges[13])
-        self._delete_info()
-
-        # Move the line to the next edge
-        self._move_sweep_line(intersection_dot, line, edges[9].start)
-
-        # Continue
-        self._write_info(
+            {"Delete": "#FF0000"},
+        ),
+        "JOIN": (
             """
-            CONTINUE
+            JOIN: Draw the edge above and below the vertex until it hits an edge.
+            Output the cells above and below the obstacle and start one cell between
+            the edges above and below. Delete the two ending edges from L.
             """,
-            {},
-        )
-        self._remove_edge_from_L(0.5, edges[9])
-        self.wait(0.5)
-        self._add_edge_to_L(0.5, edges[8])
-        cb = CellBoundary(edges[9].start, edges[5].end[1])
-        cell_boundaries[prev_cbs[0]].append(cb)
-        prev_cbs = [cb]
-        self._draw_cell_boundary(cb)
-        self._delete_info()
+            {"Delete": "#FF0000"},
+        ),
+    }
 
-        # Move the line to the next edge
-        self._move_sweep_line(intersection_dot, line, edges[8].start)
+    def construct(self):
+        """
+        Decompose the free space of the background map into trapezoids with a
+        sweep line and animate the event log it produces.
+        """
+        edges, outline_points, holes = self._create_background()
+        line = self._create_sweep_line()
+        intersection_dot = self._create_dot()
 
-        # Continue
-        self._write_info(
-            """
-            CONTINUE
-            """,
-            {},
+        self.CUSTOM_BLUE = "#0000FF"
+        self.CUSTOM_GREEN = "#01FF00"
+        self.CUSTOM_RED = "#FF0000"
+
+        decomposition = TrapezoidSweep(outline_points, holes).decompose()
+
+        # Blue edge messages
+        text = Text(
+            "Blue edges are part of free space segments in list L",
+            font="Arial", font_size=35,
         )
-        self._remove_edge_from_L(0.5, edges[8])
-        self.wait(0.5)
-        self._add_edge_to_L(0.5, edges[7])
-        cb = CellBoundary(edges[8].start, edges[5].end[1])
-        cell_boundaries[prev_cbs[0]].append(cb)
-        prev_cbs = [cb]
-        self._draw_cell_boundary(cb)
-        self._delete_info()
+        text.set_color(BLACK)
+        text.set_color_by_text("Blue", self.CUSTOM_BLUE)
+        text.move_to(UP*3.3 + LEFT*2, aligned_edge=TOP)
+        self.play(Write(text))
 
-        # Move the line to the next edge
-        self._move_sweep_line(intersection_dot, line, edges[7].start)
+        if self.BATCHED:
+            self._play_sweep(decomposition, line)
+        else:
+            self._animate_events(decomposition.events, edges, line, intersection_dot)
 
-        # Continue
         self._write_info(
             """
-            CONTINUE
+            The boundary graph is where nodes are midpoints of the vertical 
+            boundaries of each trapezoid, and edges connect any nodes 
+            touching the same trapezoid. It can be used for planning.
             """,
-            {},
+            {}
         )
-        self._remove_edge_from_L(0.5, edges[7])
+        roadmap = Roadmap(decomposition)
+        self._create_graph(roadmap)
         self._delete_info()
-        
-        # Move the line to the next edge
-        self._move_sweep_line(intersection_dot, line, edges[6].start)
 
-        # Continue
         self._write_info(
             """
-            CONTINUE
+            To plan, first find the cells containing the start and goal.
+            Binary search for the vertical slab of the point, then for the
+            cell in that slab.
             """,
-            {},
+            {}
         )
-        self._remove_edge_from_L(0.5, edges[5])
+        for point in (self.PLAN_START, self.PLAN_GOAL):
+            self._animate_point_location(roadmap.cell_index, point)
         self._delete_info()
 
         self._write_info(
             """
-            The boundary graph is where nodes are midpoints of the vertical 
-            boundaries of each trapezoid, and edges connect any nodes 
-            touching the same trapezoid. It can be used for planning.
+            Plan from the green start to the red goal by searching the graph with A*.
             """,
-            {}
+            {"green": self.CUSTOM_GREEN, "red": self.CUSTOM_RED}
         )
-        self._create_graph(cell_boundaries)
+        self._draw_path(roadmap, self.PLAN_START, self.PLAN_GOAL)
+
+    def _animate_events(self, events, edges, line, intersection_dot):
+        explained = set()
+        prev_x = None
+        for i, event in enumerate(events):
+            # Move the line
+            if i == 0:
+                self._write_info("Move the line to the left most vertex", {})
+                self.play(line.animate.move_to(self._convert_point_to_sweep_point(event.vertex)), run_time= 1.0)
+                intersection_dot.move_to(event.vertex)
+                self.play(FadeIn(intersection_dot), run_time= 1.0)
+                self._delete_info()
+            elif i == 1:
+                self._write_info("Move the line to the next closest vertex in the x-direction", {})
+                self._move_sweep_line(intersection_dot, line, event.vertex)
+                self._delete_info()
+            else:
+                self._move_sweep_line(intersection_dot, line, event.vertex)
+
+            first = event.kind not in explained
+            explained.add(event.kind)
+            if first:
+                text, coloring = self.EVENT_INFO[event.kind]
+            else:
+                text, coloring = event.kind, {}
+            if event.vertex[0] == prev_x and "co-vertical" not in explained:
+                explained.add("co-vertical")
+                text = f"""
+                {event.kind}: There are multiple vertices at this x-coordinate. This vertex, with
+                the lowest y-coordinate is processed first.
+                """
+            prev_x = event.vertex[0]
+            time = 2.0 if first else 0.5
+
+            self._write_info(text, coloring)
+            if event.ended:
+                self._remove_edge_from_L(time, *[edges[e.index] for e in event.ended])
+                if event.started:
+                    self.wait(0.5)
+            if event.started:
+                self._add_edge_to_L(time, *[edges[e.index] for e in event.started])
+            self._draw_cell_boundary(*event.boundaries)
+            self._delete_info()
 
     def _write_info(self, text, coloring):
         # Create a Text object with the given text
@@ -447,6 +1149,9 @@ class TrapezoidDecomp(Scene):
         # text_obj.arrange(DOWN, buff=0.5)  # buff controls spacing
         self.text_obj = text_obj 
         # Add the text to the scene
+        if self.BATCHED:
+            self.play(Write(self.text_obj), run_time=1.0)
+            return
         for letter in self.text_obj:
             self.play(Write(letter), run_time=0.1)
 
@@ -454,39 +1159,155 @@ class TrapezoidDecomp(Scene):
         # Remove the text from the scene
         self.play(FadeOut(self.text_obj))
 
-    def _create_graph(self, cell_boundaries):
+    def _create_graph(self, roadmap):
+        if self.BATCHED:
+            return self._create_graph_batched(roadmap)
+
         # Create Vertices
-        queue = deque()
-        queue.extend(cell_boundaries[None])
-        visited = set()
         nodes = []
-        while queue:
-            node = queue.popleft()
-            if tuple(node.center) not in visited:
-                # Create a dot for each cell boundary
-                dot = Dot(node.center, radius=0.12, fill_color=YELLOW, stroke_color=YELLOW, stroke_width=4)
-                dot.set_z_index(400)
-                nodes.append(dot)
-                # Add the neighbors to the queue for further processing
-                queue.extend(cell_boundaries[node])
-                visited.add(tuple(node.center))
+        for point in roadmap.points:
+            # Create a dot for each cell boundary
+            dot = Dot(np.array([*point, 0]), radius=0.12, fill_color=YELLOW, stroke_color=YELLOW, stroke_width=4)
+            dot.set_z_index(400)
+            nodes.append(dot)
         self.play(*[FadeIn(n) for n in nodes], run_time= 0.5)
 
-        # Create a graph with edges
-        queue = deque()
-        queue.extend(cell_boundaries[None])
-        visited = set()
-        while queue:
-            node = queue.popleft()
-            for cb in cell_boundaries[node]:
-                # Add lines to represent the edges
-                line = Line(node.center, cb.center, color=RED, stroke_width=6)
-                line.set_z_index(300)
-                self.play(ShowCreation(line))
-                if tuple(cb.center) not in visited:
-                    queue.append(cb)
-                    visited.add(tuple(cb.center))
-        
+        # Create a graph with edges, in breadth first order from each component
+        visited = np.zeros(roadmap.num_nodes, dtype=bool)
+        done = np.zeros(roadmap.num_nodes, dtype=bool)
+        for root in range(roadmap.num_nodes):
+            if visited[root]:
+                continue
+            visited[root] = True
+            queue = deque([root])
+            while queue:
+                u = queue.popleft()
+                done[u] = True
+                for v in roadmap.indices[roadmap.indptr[u]:roadmap.indptr[u + 1]]:
+                    # Each edge once, from the endpoint reached first
+                    if not done[v]:
+                        # Add lines to represent the edges
+                        line = Line(np.array([*roadmap.points[u], 0]), np.array([*roadmap.points[v], 0]), color=RED, stroke_width=6)
+                        line.set_z_index(300)
+                        self.play(ShowCreation(line))
+                    if not visited[v]:
+                        visited[v] = True
+                        queue.append(v)
+
+    def _create_graph_batched(self, roadmap, run_time=3.0):
+        # All nodes as one dot cloud and all edges as one mobject, drawn in
+        # breadth first order so the graph grows from the left
+        points = np.column_stack([roadmap.points, np.zeros(roadmap.num_nodes)])
+        nodes = DotCloud(points, radius=0.06, color=YELLOW)
+        nodes.set_z_index(400)
+
+        order = []
+        visited = np.zeros(roadmap.num_nodes, dtype=bool)
+        done = np.zeros(roadmap.num_nodes, dtype=bool)
+        for root in range(roadmap.num_nodes):
+            if visited[root]:
+                continue
+            visited[root] = True
+            queue = deque([root])
+            while queue:
+                u = queue.popleft()
+                done[u] = True
+                for v in roadmap.indices[roadmap.indptr[u]:roadmap.indptr[u + 1]]:
+                    # Each edge once, from the endpoint reached first
+                    if not done[v]:
+                        order.append((u, v))
+                    if not visited[v]:
+                        visited[v] = True
+                        queue.append(v)
+        edges = self._merge_lines([(points[u], points[v]) for u, v in order], stroke_color=RED, stroke_width=2)
+        edges.set_z_index(300)
+        self.play(FadeIn(nodes), ShowCreation(edges), run_time=run_time)
+        return nodes, edges
+
+    def _play_sweep(self, decomposition, line, chunks=20, run_time=4.0):
+        # Move the sweep line across the map once while the boundaries appear
+        # behind it, grouped into a few merged mobjects by x
+        boundaries = decomposition.boundaries
+        groups = [
+            self._merge_lines([(b.start, b.end) for b in part], stroke_color=BLACK, stroke_width=2)
+            for part in np.array_split(np.array(boundaries, dtype=object), min(chunks, max(len(boundaries), 1)))
+            if len(part)
+        ]
+        for g in groups:
+            g.set_z_index(100)
+        x_end = decomposition.events[-1].vertex[0] if decomposition.events else 0
+        self.play(
+            line.animate.move_to(np.array([x_end, 0, 0])),
+            LaggedStart(*[ShowCreation(g) for g in groups], lag_ratio=1.0),
+            run_time=run_time,
+            rate_func=linear,
+        )
+        self.play(FadeOut(line), run_time=0.5)
+        return groups
+
+    def _merge_lines(self, segments, **style):
+        # Any number of line segments as a single mobject
+        lines = VMobject(**style)
+        for start, end in segments:
+            lines.start_new_path(start)
+            lines.add_line_to(end)
+        return lines
+
+    def _animate_point_location(self, index, point):
+        slab, probes, cell = index.trace(point)
+        dot = Dot(point, radius=0.1, fill_color=BLACK)
+        dot.set_z_index(600)
+        self.play(FadeIn(dot), run_time= 0.5)
+        if slab is None:
+            self.play(FadeOut(dot), run_time= 0.5)
+            return cell
+
+        # Slab found by the first binary search
+        frame_height = self.camera.frame.get_height()
+        slab_rect = Rectangle(
+            width=index.xs[slab + 1] - index.xs[slab],
+            height=frame_height,
+            fill_color=self.CUSTOM_BLUE,
+            fill_opacity=0.2,
+            stroke_width=0,
+        )
+        slab_rect.move_to(np.array([(index.xs[slab] + index.xs[slab + 1]) / 2, 0, 0]))
+        slab_rect.set_z_index(50)
+        self.play(FadeIn(slab_rect), run_time= 0.5)
+
+        # Cells probed by the search within the slab
+        for c in probes:
+            probe = Polygon(*index.cell_corners(c), fill_color=YELLOW, fill_opacity=0.6, stroke_width=0)
+            probe.set_z_index(60)
+            self.play(FadeIn(probe), run_time= 0.3)
+            self.play(FadeOut(probe), run_time= 0.3)
+
+        if cell >= 0:
+            found = Polygon(*index.cell_corners(cell), fill_color=self.CUSTOM_GREEN, fill_opacity=0.6, stroke_width=0)
+            found.set_z_index(60)
+            self.play(FadeIn(found), run_time= 0.5)
+            self.wait(0.5)
+            self.play(FadeOut(found), FadeOut(slab_rect), FadeOut(dot), run_time= 0.5)
+        else:
+            self.play(FadeOut(slab_rect), FadeOut(dot), run_time= 0.5)
+        return cell
+
+    def _draw_path(self, roadmap, start, goal):
+        result = roadmap.shortest_path(start, goal)
+        if result is None:
+            return None
+        path, length = result
+        start_dot = Dot(start, radius=0.15, fill_color=self.CUSTOM_GREEN, stroke_color=BLACK, stroke_width=4)
+        goal_dot = Dot(goal, radius=0.15, fill_color=self.CUSTOM_RED, stroke_color=BLACK, stroke_width=4)
+        start_dot.set_z_index(600)
+        goal_dot.set_z_index(600)
+        self.play(FadeIn(start_dot), FadeIn(goal_dot))
+
+        path_line = VMobject(stroke_color=self.CUSTOM_BLUE, stroke_width=8)
+        path_line.set_points_as_corners([np.array([x, y, 0]) for x, y in path])
+        path_line.set_z_index(500)
+        self.play(ShowCreation(path_line), run_time= 2.0)
+        return path_line
 
     def _move_sweep_line(self, dot, line, point):
         self.play(FadeOut(dot), run_time= 0.5)
@@ -506,6 +1327,10 @@ class TrapezoidDecomp(Scene):
        return ApplyMethod(edge.set_color, color)
 
     def _create_background(self):
+        if self.ENVIRONMENT is not None:
+            outline_points, holes = self._load_background(self.ENVIRONMENT)
+            return self._draw_background(outline_points, holes)
+
         outline_points = [
             np.array([-6.5, -3.5, 0]),
             np.array([-6.0, 3.5, 0]),
@@ -543,6 +1368,22 @@ class TrapezoidDecomp(Scene):
         inner_points = (np.array(inner_points) - np.array([3.0, 0.0, 0.0])) / 1.5
         inner_points = list(inner_points)
 
+        return self._draw_background(outline_points, [inner_points])
+
+    def _load_background(self, path):
+        return self._place_background(*load_environment(path))
+
+    def _place_background(self, outline, holes):
+        # Scale a map into the area the built-in map covers
+        lower, upper = outline.min(axis=0), outline.max(axis=0)
+        scale = min(8.5 / (upper[0] - lower[0]), 4.7 / (upper[1] - lower[1]))
+        center = (lower + upper) / 2
+        def place(ring):
+            ring = (ring - center) * scale + np.array([-2.0, 0.0])
+            return [np.array([x, y, 0]) for x, y in ring]
+        return place(outline), [place(h) for h in holes]
+
+    def _draw_background(self, outline_points, holes):
         outer_polygon = Polygon(
             *outline_points,
             fill_color=WHITE,
@@ -550,14 +1391,21 @@ class TrapezoidDecomp(Scene):
             stroke_color=BLACK,
         )
 
-        inner_polygon = Polygon(
-            *inner_points,
-            fill_color="#CCCCCC",  # Light gray
-            fill_opacity=1,  # Semi-transparent fill
-            stroke_color=BLACK,
-        )
-        
-        self.play(FadeIn(outer_polygon), FadeIn(inner_polygon))
+        inner_polygons = [
+            Polygon(
+                *inner_points,
+                fill_color="#CCCCCC",  # Light gray
+                fill_opacity=1,  # Semi-transparent fill
+                stroke_color=BLACK,
+            )
+            for inner_points in holes
+        ]
+
+        self.play(FadeIn(outer_polygon), *[FadeIn(p) for p in inner_polygons])
+        if self.BATCHED:
+            # Polygon outlines already show the edges, they are only drawn
+            # separately to be highlighted event by event
+            return [], outline_points, holes
 
         def _create_edge(edge, color):
             hEdge = Line(
@@ -576,12 +1424,13 @@ class TrapezoidDecomp(Scene):
             for e in zip(outline_points, outline_points[1:] + [outline_points[0]])
         ]
 
-        edges += [
-            _create_edge(e, color=BLACK)
-            for e in zip(inner_points, inner_points[1:] + [inner_points[0]])
-        ]
+        for inner_points in holes:
+            edges += [
+                _create_edge(e, color=BLACK)
+                for e in zip(inner_points, inner_points[1:] + [inner_points[0]])
+            ]
 
-        return edges
+        return edges, outline_points, holes
 
     def _draw_cell_boundary(self, *cell_boundary):
         for cb in cell_boundary:
@@ -627,4 +1476,42 @@ class TrapezoidDecomp(Scene):
         )
         line.set_z_index(100)
         self.play(FadeIn(line))
-        return line
\ No newline at end of file
+        return line
+
+
+
+class TrapezoidDecompLarge(TrapezoidDecomp):
+    """Decomposition of a generated floor plan with many obstacles, drawn in batches."""
+    BATCHED = True
+    GRID = (8, 5)
+    PLAN_START = np.array([-5.3, -2.1, 0])
+    PLAN_GOAL = np.array([1.3, 2.1, 0])
+
+    def _create_background(self):
+        if self.ENVIRONMENT is not None:
+            return super()._create_background()
+        outline, holes = floor_plan(*self.GRID)
+        return self._draw_background(*self._place_background(outline, holes))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decompose a polygon with holes into trapezoids and write the cells and roadmap to disk.")
+    parser.add_argument("environment", nargs="?", help="GeoJSON polygon file or .npz vertex array")
+    parser.add_argument("--out", default="trapezoid_decomp", help="directory for cells.csv, boundaries.csv and roadmap.csv")
+    parser.add_argument("--benchmark", type=int, nargs="*", metavar="N",
+                        help="benchmark moving obstacles of N by N floor plans instead")
+    args = parser.parse_args()
+
+    if args.benchmark is not None:
+        for row in benchmark_incremental(args.benchmark or [4, 8, 16, 32, 64]):
+            print(f"n={row['n']:>3} vertices={row['vertices']:>6}: incremental {row['incremental_ms']:8.2f}ms, "
+                  f"full {row['full_ms']:8.2f}ms, speedup {row['speedup']:.1f}x")
+        raise SystemExit
+    if args.environment is None:
+        parser.error("an environment file is required")
+
+    start = time.perf_counter()
+    outline, holes = load_environment(args.environment)
+    counts = decompose_to_disk(outline, holes, args.out)
+    print(f"{counts['vertices']} vertices -> {counts['cells']} cells, {counts['boundaries']} boundaries, "
+          f"{counts['roadmap_edges']} roadmap edges in {time.perf_counter() - start:.2f}s")